@@ -0,0 +1,84 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from api.catalogue import cached_catalogue_response
+from api.filters import IngredientFilter
+from api.page_cache import cached_page
+from api.representations import get_cached_recipe_data, merge_user_state
+from api.search import ingredient_index
+from api.user_state import EMPTY_STATE
+from api.views import IngredientsViewSet, RecipeViewSet, TagsViewSet
+
+
+def is_anonymous_json(request):
+    return (request.method == 'GET'
+            and 'HTTP_AUTHORIZATION' not in request.META
+            and 'format' not in request.GET
+            and 'text/html' not in request.META.get('HTTP_ACCEPT', ''))
+
+
+def json_response(data):
+    return HttpResponse(
+        JSONRenderer().render(data), content_type='application/json')
+
+
+def offloaded(viewset, actions, fast_path):
+    view = viewset.as_view(actions)
+    sync_view = sync_to_async(view)
+    cached_view = sync_to_async(fast_path, thread_sensitive=False)
+
+    async def async_view(request, *args, **kwargs):
+        if is_anonymous_json(request):
+            response = await cached_view(request, *args, **kwargs)
+            if response is not None:
+                patch_vary_headers(response, ('Accept',))
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.cls = view.cls
+    async_view.actions = view.actions
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def recipe_list_fast_path(request):
+    return cached_page(request)
+
+
+def recipe_detail_fast_path(request, pk):
+    _, entry = get_cached_recipe_data(pk)
+    if entry is None:
+        return None
+    return json_response(merge_user_state(entry, EMPTY_STATE))
+
+
+def tags_fast_path(request):
+    return cached_catalogue_response(request, 'tags')
+
+
+def ingredients_fast_path(request):
+    name = request.GET.get(IngredientFilter.search_param)
+    if not name:
+        return cached_catalogue_response(request, 'ingredients')
+    if not ingredient_index.is_current():
+        return None
+    return json_response(ingredient_index.search(name))
+
+
+recipe_list = offloaded(
+    RecipeViewSet, {'get': 'list', 'post': 'create'}, recipe_list_fast_path)
+recipe_detail = offloaded(
+    RecipeViewSet,
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    recipe_detail_fast_path,
+)
+tag_list = offloaded(TagsViewSet, {'get': 'list'}, tags_fast_path)
+ingredient_list = offloaded(
+    IngredientsViewSet, {'get': 'list'}, ingredients_fast_path)
@@ -0,0 +1,67 @@
+import time
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = 'catalogue:{}:version'
+CONTENT_KEY = 'catalogue-content:{}:{}'
+
+
+def _new_version():
+    return time.time_ns(), int(time.time())
+
+
+def get_catalogue_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_catalogue_version(name):
+    cache.set(VERSION_KEY.format(name), _new_version(), timeout=None)
+
+
+def build_catalogue_entry(data):
+    content = JSONRenderer().render(data)
+    return {
+        'content': content,
+        'etag': quote_etag(md5(content).hexdigest()),
+        'modified': int(time.time()),
+    }
+
+
+def catalogue_entry_response(request, entry):
+    response = HttpResponse(entry['content'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['modified'])
+    return get_conditional_response(
+        request,
+        etag=entry['etag'],
+        last_modified=entry['modified'],
+        response=response,
+    )
+
+
+def cached_catalogue_response(request, name):
+    version, _ = get_catalogue_version(name)
+    entry = cache.get(CONTENT_KEY.format(name, version))
+    if entry is None:
+        return None
+    return catalogue_entry_response(request, entry)
+
+
+def catalogue_response(request, name, get_data):
+    version, _ = get_catalogue_version(name)
+    key = CONTENT_KEY.format(name, version)
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_catalogue_entry(get_data())
+        cache.set(key, entry)
+    return catalogue_entry_response(request, entry)
@@ -0,0 +1,41 @@
+from itertools import chain
+from random import getrandbits
+
+from django.core.cache import cache
+
+SEQUENCE_KEY = 'changes:{}:sequence'
+CHANGE_KEY = 'changes:{}:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+CHANGES_LIMIT = 1000
+
+
+class ChangeLog:
+    def __init__(self, name):
+        self.name = name
+
+    def sequence(self):
+        key = SEQUENCE_KEY.format(self.name)
+        sequence = cache.get(key)
+        if sequence is None:
+            cache.add(key, getrandbits(32), timeout=None)
+            sequence = cache.get(key)
+        return sequence
+
+    def record(self, ids=None):
+        self.sequence()
+        sequence = cache.incr(SEQUENCE_KEY.format(self.name))
+        cache.set(CHANGE_KEY.format(self.name, sequence),
+                  None if ids is None else list(ids),
+                  CHANGE_TIMEOUT)
+
+    def changed_ids(self, start, end):
+        if end - start > CHANGES_LIMIT:
+            return None
+        keys = [
+            CHANGE_KEY.format(self.name, number)
+            for number in range(start + 1, end + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys) or None in changes.values():
+            return None
+        return set(chain.from_iterable(changes.values()))
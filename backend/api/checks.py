@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кеш по умолчанию не разделяется между процессами.',
+        hint=('Версии каталогов, индексы поиска и журнал изменений рецептов '
+              'хранятся в кеше: задайте CACHE_BACKEND с общим хранилищем, '
+              'например memcached.'),
+        id='api.W001',
+    )]
@@ -1,30 +1,85 @@
 from base64 import b64decode
-from imghdr import what
+from tempfile import SpooledTemporaryFile
 from uuid import uuid4
 
-from django.core.files.base import ContentFile
-from rest_framework.serializers import ImageField
-from six import string_types
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+from rest_framework.serializers import ImageField, ValidationError
+
+from api.images import rendition_url, rendition_urls
 
 WRONG_IMAGE_TYPE = "Кривой формат файла картинки"
+TOO_LARGE_IMAGE = "Слишком большой файл картинки"
 BASE64 = ";base64,"
+CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
 
 
 class Base64ImageField(ImageField):
     def to_internal_value(self, data):
-        if isinstance(data, string_types):
+        if isinstance(data, str):
             if "data:" in data and BASE64 in data:
                 header, data = data.split(BASE64)
-            try:
-                decoded_file = b64decode(data)
-            except TypeError:
-                self.fail(WRONG_IMAGE_TYPE)
+            decoded_file = self.decode(data)
             file_name = str(uuid4())[:12]
-            file_extension = self.get_file_extension(file_name, decoded_file)
+            file_extension = self.get_file_extension(decoded_file)
             complete_file_name = "%s.%s" % (file_name, file_extension)
-            data = ContentFile(decoded_file, name=complete_file_name)
+            data = File(decoded_file, name=complete_file_name)
         return super().to_internal_value(data)
 
-    def get_file_extension(self, file_name, decoded_file):
-        extension = what(file_name, decoded_file)
-        return "jpg" if extension == "jpeg" else extension
+    def decode(self, data):
+        decoded_file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        if len(data) * 3 // 4 > settings.IMAGE_MAX_SIZE:
+            raise ValidationError(TOO_LARGE_IMAGE)
+        try:
+            for start in range(0, len(data), CHUNK_SIZE):
+                decoded_file.write(
+                    b64decode(data[start:start + CHUNK_SIZE], validate=True))
+        except ValueError:
+            raise ValidationError(WRONG_IMAGE_TYPE)
+        decoded_file.seek(0)
+        return decoded_file
+
+    def get_file_extension(self, decoded_file):
+        try:
+            with Image.open(decoded_file) as image:
+                extension = IMAGE_FORMATS.get(image.format)
+        except (OSError, Image.DecompressionBombError):
+            extension = None
+        if extension is None:
+            raise ValidationError(WRONG_IMAGE_TYPE)
+        decoded_file.seek(0)
+        return extension
+
+
+class RenditionImageField(ImageField):
+    def __init__(self, size, **kwargs):
+        self.size = size
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = rendition_url(value, self.size)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class RenditionsField(ImageField):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        return {
+            size: request.build_absolute_uri(url) if request else url
+            for size, url in rendition_urls(value).items()
+        }
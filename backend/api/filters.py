@@ -1,23 +1,32 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
-from recipes.models import Recipe
-from rest_framework.filters import SearchFilter
+from recipes.models import Cart, Favorite, Recipe, Tag
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+
+from api.search import search_recipes
 
 
 class TagFavoritShopingFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+    )
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
 
-    def get_is_favorited(self, queryset, value, name):
+    def get_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk'))))
         return queryset
 
-    def get_is_in_shopping_cart(self, queryset, value, name):
+    def get_is_in_shopping_cart(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(user_shopping_cart__user=self.request.user)
+            return queryset.filter(Exists(Cart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk'))))
         return queryset
 
     class Meta:
@@ -27,3 +36,13 @@ class TagFavoritShopingFilter(filters.FilterSet):
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_recipes(queryset, query)
@@ -0,0 +1,113 @@
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+RENDITIONS = {
+    'full': 1280,
+    'card': 600,
+    'preview': 240,
+}
+RENDITION_FORMAT = 'JPEG'
+RENDITION_QUALITY = 85
+KNOWN_IMAGES_LIMIT = 10000
+
+logger = logging.getLogger(__name__)
+executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+ready = OrderedDict()
+failed = OrderedDict()
+pending = set()
+pending_lock = Lock()
+
+
+def remember(names, name):
+    with pending_lock:
+        names[name] = True
+        names.move_to_end(name)
+        if len(names) > KNOWN_IMAGES_LIMIT:
+            names.popitem(last=False)
+
+
+def rendition_name(name, size):
+    root, _ = os.path.splitext(name)
+    return f'renditions/{size}/{root}.jpg'
+
+
+def make_rendition(image, size):
+    rendition = image.copy()
+    rendition.thumbnail((RENDITIONS[size], RENDITIONS[size]))
+    buffer = BytesIO()
+    rendition.save(
+        buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def make_renditions(name):
+    sizes = [
+        size for size in RENDITIONS
+        if not default_storage.exists(rendition_name(name, size))
+    ]
+    if not sizes:
+        return
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    for size in sizes:
+        default_storage.save(
+            rendition_name(name, size), make_rendition(image, size))
+
+
+def finish_renditions(name, future):
+    error = future.exception()
+    with pending_lock:
+        pending.discard(name)
+    if error is not None:
+        remember(failed, name)
+        logger.error(
+            'Не удалось построить миниатюры для %s', name, exc_info=error)
+
+
+def schedule_renditions(name):
+    with pending_lock:
+        if name in pending or name in failed:
+            return
+        pending.add(name)
+    future = executor.submit(make_renditions, name)
+    future.add_done_callback(lambda future: finish_renditions(name, future))
+
+
+def delete_image(name):
+    for path in (name, *(rendition_name(name, size) for size in RENDITIONS)):
+        default_storage.delete(path)
+    with pending_lock:
+        failed.pop(name, None)
+        for size in RENDITIONS:
+            ready.pop(rendition_name(name, size), None)
+
+
+def rendition_url(image, size):
+    path = rendition_name(image.name, size)
+    if path in ready or default_storage.exists(path):
+        remember(ready, path)
+        return default_storage.url(path)
+    schedule_renditions(image.name)
+    return image.url
+
+
+def rendition_urls(image):
+    return {size: rendition_url(image, size) for size in RENDITIONS}
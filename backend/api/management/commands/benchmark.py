@@ -0,0 +1,173 @@
+import json
+import random
+import time
+from base64 import b64encode
+from io import BytesIO
+from statistics import mean
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.images import delete_image
+from recipes.models import Cart, Ingredient, Recipe, Tag
+from users.models import Follow
+
+RECIPE_NAME = 'Рецепт для нагрузочного теста'
+SCENARIOS = (
+    'recipe_list',
+    'recipe_list_filtered',
+    'recipe_search',
+    'recipe_detail',
+    'subscriptions',
+    'ingredient_search',
+    'download_shopping_cart',
+    'recipe_create',
+)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), 'green').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+class Command(BaseCommand):
+    help = 'benchmarking hot API endpoints through the test client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', default=100, type=int)
+        parser.add_argument('--warmup', default=5, type=int)
+        parser.add_argument('--scenario', action='append',
+                            choices=SCENARIOS)
+        parser.add_argument('--output', help='путь к JSON-отчёту')
+        parser.add_argument('--seed', default=0, type=int)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.prepare()
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'dataset': {
+                model._meta.model_name: model.objects.count()
+                for model in (Recipe, Ingredient, Tag, Cart, Follow)
+            },
+            'results': {},
+        }
+        try:
+            for name in options['scenario'] or SCENARIOS:
+                report['results'][name] = self.run(
+                    getattr(self, name),
+                    options['requests'],
+                    options['warmup'],
+                )
+                self.stderr.write(f'{name}: {report["results"][name]}')
+        finally:
+            self.cleanup()
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def prepare(self):
+        cart = Cart.objects.order_by('user_id').first()
+        follow = Follow.objects.order_by('user_id').first()
+        if cart is None or follow is None:
+            raise CommandError('Сначала заполните базу командой seed_data')
+        self.recipes = list(Recipe.objects.values_list('id', flat=True))
+        self.tags = list(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        self.image = make_image()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user_id=cart.user_id)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.follower = APIClient()
+        token, _ = Token.objects.get_or_create(user_id=follow.user_id)
+        self.follower.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @staticmethod
+    def cleanup():
+        recipes = Recipe.objects.filter(name=RECIPE_NAME)
+        for recipe in recipes:
+            delete_image(recipe.image.name)
+        recipes.delete()
+
+    def run(self, scenario, requests, warmup):
+        for _ in range(warmup):
+            scenario()
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = scenario()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append(time.perf_counter() - start)
+            queries.append(len(context.captured_queries))
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - started
+        return {
+            'requests': requests,
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'mean_queries': round(mean(queries), 2),
+            'max_queries': max(queries),
+            'throughput_rps': round(requests / elapsed, 1),
+        }
+
+    def recipe_list(self):
+        return self.anonymous.get(
+            '/api/recipes/', {'page': self.random.randint(1, 10)})
+
+    def recipe_list_filtered(self):
+        slug, _ = self.random.choice(self.tags)
+        return self.client.get(
+            '/api/recipes/', {'tags': slug, 'is_favorited': 1})
+
+    def recipe_search(self):
+        _, name = self.random.choice(self.ingredients)
+        return self.anonymous.get(
+            '/api/recipes/', {'search': name.split()[0]})
+
+    def recipe_detail(self):
+        return self.anonymous.get(
+            f'/api/recipes/{self.random.choice(self.recipes)}/')
+
+    def subscriptions(self):
+        return self.follower.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3})
+
+    def ingredient_search(self):
+        _, name = self.random.choice(self.ingredients)
+        return self.anonymous.get('/api/ingredients/', {'name': name[:3]})
+
+    def download_shopping_cart(self):
+        return self.client.get('/api/recipes/download_shopping_cart/')
+
+    def recipe_create(self):
+        return self.client.post('/api/recipes/', {
+            'name': RECIPE_NAME,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': self.image,
+            'tags': [id for _, id in self.random.sample(self.tags, 2)],
+            'ingredients': [
+                {'id': id, 'amount': self.random.randint(1, 100)}
+                for id, _ in self.random.sample(self.ingredients, 5)
+            ],
+        }, format='json')
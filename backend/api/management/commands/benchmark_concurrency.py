@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+from itertools import cycle
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.management.commands.benchmark import percentile
+
+DEFAULT_PATHS = ('/api/recipes/', '/api/tags/', '/api/ingredients/')
+ERROR_BACKOFF = 0.1
+
+
+async def read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length, chunked, keep_alive = 0, False, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and 'close' in value.lower():
+            keep_alive = False
+    if not chunked:
+        await reader.readexactly(length)
+        return status, keep_alive
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        await reader.readexactly(size + 2)
+        if not size:
+            return status, keep_alive
+
+
+class Command(BaseCommand):
+    help = 'measuring throughput of a running server under many connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--path', action='append')
+        parser.add_argument('--connections', default=500, type=int)
+        parser.add_argument('--duration', default=10, type=float)
+        parser.add_argument('--timeout', default=30, type=float)
+        parser.add_argument('--output', help='путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Поддерживается только http')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = options['timeout']
+        self.paths = [
+            quote(path, safe='/?=&')
+            for path in options['path'] or DEFAULT_PATHS
+        ]
+        self.latencies, self.errors = [], 0
+        elapsed = asyncio.run(
+            self.run(options['connections'], options['duration']))
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'url': options['url'],
+            'paths': self.paths,
+            'connections': options['connections'],
+            'duration_s': round(elapsed, 2),
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'throughput_rps': round(len(self.latencies) / elapsed, 1),
+        }
+        if self.latencies:
+            report.update({
+                'p50_ms': round(percentile(self.latencies, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(self.latencies, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(self.latencies, 0.99) * 1000, 2),
+            })
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    async def run(self, connections, duration):
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            self.connection(number, deadline)
+            for number in range(connections)
+        ))
+        return time.perf_counter() - started
+
+    async def connection(self, number, deadline):
+        paths = cycle(self.paths[number % len(self.paths):]
+                      + self.paths[:number % len(self.paths)])
+        writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port),
+                        self.timeout)
+                start = time.perf_counter()
+                writer.write((
+                    f'GET {next(paths)} HTTP/1.1\r\n'
+                    f'Host: {self.host}:{self.port}\r\n'
+                    'Accept: application/json\r\n\r\n'
+                ).encode())
+                status, keep_alive = await asyncio.wait_for(
+                    read_response(reader), self.timeout)
+            except (OSError, ValueError, IndexError,
+                    asyncio.IncompleteReadError, asyncio.TimeoutError):
+                self.errors += 1
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                await asyncio.sleep(ERROR_BACKOFF)
+                continue
+            if status >= 400:
+                self.errors += 1
+            else:
+                self.latencies.append(time.perf_counter() - start)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from threading import Lock
+
+from recipes.models import IngredientAmount
+
+from api.changes import ChangeLog
+
+MATCH_RESULTS_LIMIT = 1000
+
+ingredient_changes = ChangeLog('matching')
+
+
+def record_changes(recipe_ids=None):
+    ingredient_changes.record(recipe_ids)
+
+
+def make_mask(positions, length):
+    buffer = bytearray(length // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def iter_positions(mask):
+    while mask:
+        position = mask.bit_length() - 1
+        yield position
+        mask ^= 1 << position
+
+
+class IngredientMatcher:
+    def __init__(self):
+        self._lock = Lock()
+        self._sequence = None
+        self._ids = []
+        self._positions = {}
+        self._recipes = {}
+        self._masks = defaultdict(int)
+        self._sizes = defaultdict(int)
+
+    @staticmethod
+    def _read(recipe_ids=None):
+        queryset = IngredientAmount.objects.order_by('recipe_id')
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in queryset.values_list(
+                'recipe_id', 'ingredients_id').iterator():
+            recipes[recipe_id].add(ingredient_id)
+        return recipes
+
+    def _rebuild(self):
+        recipes = self._read()
+        self._ids = list(recipes)
+        self._positions = {id: index for index, id in enumerate(self._ids)}
+        self._recipes = {
+            id: frozenset(ingredients) for id, ingredients in recipes.items()
+        }
+        ingredients = defaultdict(list)
+        sizes = defaultdict(list)
+        for position, id in enumerate(self._ids):
+            sizes[len(recipes[id])].append(position)
+            for ingredient_id in recipes[id]:
+                ingredients[ingredient_id].append(position)
+        length = len(self._ids)
+        self._masks = defaultdict(int, {
+            id: make_mask(positions, length)
+            for id, positions in ingredients.items()
+        })
+        self._sizes = defaultdict(int, {
+            size: make_mask(positions, length)
+            for size, positions in sizes.items()
+        })
+
+    def _update(self, recipes, recipe_ids):
+        for recipe_id in recipe_ids:
+            ingredients = self._recipes.pop(recipe_id, None)
+            if ingredients is not None:
+                bit = 1 << self._positions[recipe_id]
+                self._sizes[len(ingredients)] &= ~bit
+                for id in ingredients:
+                    self._masks[id] &= ~bit
+        for recipe_id, ingredients in recipes.items():
+            if recipe_id not in self._positions:
+                self._positions[recipe_id] = len(self._ids)
+                self._ids.append(recipe_id)
+            bit = 1 << self._positions[recipe_id]
+            self._recipes[recipe_id] = frozenset(ingredients)
+            self._sizes[len(ingredients)] |= bit
+            for id in ingredients:
+                self._masks[id] |= bit
+
+    def _refresh(self):
+        sequence = ingredient_changes.sequence()
+        if self._sequence is None or sequence < self._sequence:
+            self._rebuild()
+        elif sequence > self._sequence:
+            recipe_ids = ingredient_changes.changed_ids(
+                self._sequence, sequence)
+            if recipe_ids is None:
+                self._rebuild()
+            else:
+                self._update(self._read(recipe_ids), recipe_ids)
+        self._sequence = sequence
+
+    def _count_planes(self, ingredient_ids):
+        planes = []
+        for id in ingredient_ids:
+            carry = self._masks.get(id, 0)
+            for index, plane in enumerate(planes):
+                planes[index], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        return planes
+
+    def match(self, ingredient_ids):
+        with self._lock:
+            self._refresh()
+            planes = self._count_planes(set(ingredient_ids))
+            buckets = []
+            for matched in range(1, 2 ** len(planes)):
+                mask = -1
+                for index, plane in enumerate(planes):
+                    mask &= plane if matched >> index & 1 else ~plane
+                for size, size_mask in self._sizes.items():
+                    if size >= matched and mask & size_mask:
+                        buckets.append((matched / size, matched,
+                                        mask & size_mask))
+            results = []
+            for _, matched, mask in sorted(buckets, reverse=True):
+                for position in iter_positions(mask):
+                    recipe_id = self._ids[position]
+                    results.append((
+                        recipe_id, matched, len(self._recipes[recipe_id])))
+                    if len(results) == MATCH_RESULTS_LIMIT:
+                        return results
+            return results
+
+
+ingredient_matcher = IngredientMatcher()
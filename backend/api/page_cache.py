@@ -0,0 +1,84 @@
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from api.catalogue import bump_catalogue_version, get_catalogue_version
+
+PAGE_KEY = 'recipe-page:{}'
+LOCK_KEY = 'recipe-page-lock:{}'
+LOCK_TIMEOUT = 10
+
+
+def get_generation():
+    return tuple(
+        get_catalogue_version(name)[0]
+        for name in ('recipe-list', 'tags', 'ingredients')
+    )
+
+
+def bump_generation():
+    bump_catalogue_version('recipe-list')
+
+
+def page_digest(request):
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values if value
+    )
+    return md5(
+        f'{request.get_host()}?{urlencode(params)}'.encode()).hexdigest()
+
+
+def is_stale(entry, generation):
+    return (entry['generation'] != generation
+            or time.time() - entry['created']
+            > settings.RECIPE_PAGE_CACHE_TIMEOUT)
+
+
+def page_response(entry):
+    response = HttpResponse(entry['content'], content_type='application/json')
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.RECIPE_PAGE_CACHE_TIMEOUT,
+        stale_while_revalidate=settings.RECIPE_PAGE_STALE_TIMEOUT,
+    )
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def cached_page(request):
+    entry = cache.get(PAGE_KEY.format(page_digest(request)))
+    if entry is None or is_stale(entry, get_generation()):
+        return None
+    return page_response(entry)
+
+
+def cached_page_response(request, get_data):
+    digest = page_digest(request)
+    key = PAGE_KEY.format(digest)
+    lock = LOCK_KEY.format(digest)
+    generation = get_generation()
+    entry = cache.get(key)
+    locked = (entry is not None and is_stale(entry, generation)
+              and cache.add(lock, True, LOCK_TIMEOUT))
+    if entry is None or locked:
+        try:
+            entry = {
+                'generation': generation,
+                'created': time.time(),
+                'content': JSONRenderer().render(get_data()),
+            }
+            cache.set(key, entry, settings.RECIPE_PAGE_CACHE_TIMEOUT
+                      + settings.RECIPE_PAGE_STALE_TIMEOUT)
+        finally:
+            if locked:
+                cache.delete(lock)
+    return page_response(entry)
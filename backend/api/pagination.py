@@ -1,6 +1,104 @@
-from rest_framework.pagination import PageNumberPagination
+from hashlib import md5
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from api.catalogue import bump_catalogue_version, get_catalogue_version
+
+COUNT_KEY = 'pagination:count:{}'
+
+
+def table_version_name(table):
+    return f'table-{table}'
+
+
+def bump_table_version(model):
+    bump_catalogue_version(table_version_name(model._meta.db_table))
+
+
+def get_table_versions(sql):
+    return [
+        get_catalogue_version(table_version_name(table))[0]
+        for table in sorted({
+            model._meta.db_table for model in apps.get_models(
+                include_auto_created=True)
+        })
+        if f'"{table}"' in sql
+    ]
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        sql = str(self.object_list.query)
+        key = COUNT_KEY.format(md5(
+            f'{sql}{get_table_versions(sql)}'.encode()).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class LimitCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return tuple(ordering)
+        if isinstance(self.ordering, str):
+            return (self.ordering,)
+        return tuple(self.ordering)
+
+
+class FollowCursorPagination(LimitCursorPagination):
+    ordering = '-id'
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_pagination_class = None
+
+    def __init__(self):
+        if settings.PAGINATION_COUNT_CACHE_TIMEOUT:
+            self.django_paginator_class = CachedCountPaginator
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_pagination_class is not None
+                and 'cursor' in request.query_params):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class RecipePagination(LimitPageNumberPagination):
+    cursor_pagination_class = LimitCursorPagination
+
+
+class FollowPagination(LimitPageNumberPagination):
+    cursor_pagination_class = FollowCursorPagination
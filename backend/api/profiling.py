@@ -0,0 +1,150 @@
+import logging
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+
+METRICS_PREFIX = 'foodgram'
+METRICS = (
+    ('requests_total', 'counter', 'Число запросов'),
+    ('queries_total', 'counter', 'Число SQL-запросов'),
+    ('db_seconds_total', 'counter', 'Время выполнения SQL'),
+    ('serialize_seconds_total', 'counter', 'Время сериализации'),
+    ('duration_seconds_total', 'counter', 'Время обработки запроса'),
+    ('response_bytes_total', 'counter', 'Размер ответов'),
+    ('query_budget_exceeded_total', 'counter',
+     'Число превышений бюджета SQL-запросов'),
+)
+
+
+class QueryBudgetExceededError(Exception):
+    pass
+
+
+class Profile:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.endpoint = None
+        self.budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = Lock()
+        self._values = defaultdict(lambda: defaultdict(float))
+
+    def record(self, labels, **values):
+        with self._lock:
+            for name, value in values.items():
+                self._values[name][labels] += value
+
+    def render(self, prefix=METRICS_PREFIX):
+        lines = []
+        with self._lock:
+            for name, kind, help_text in METRICS:
+                lines.append(f'# HELP {prefix}_{name} {help_text}')
+                lines.append(f'# TYPE {prefix}_{name} {kind}')
+                for (view, method), value in sorted(
+                        self._values[name].items()):
+                    lines.append(
+                        f'{prefix}_{name}{{view="{view}",method="{method}"}}'
+                        f' {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def profile_serializer(serializer):
+    profile = current_profile.get()
+    if profile is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed(instance):
+        start = time.perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            profile.serialize_time += time.perf_counter() - start
+    serializer.to_representation = timed
+    return serializer
+
+
+class ProfiledSerializerMixin:
+    def get_serializer(self, *args, **kwargs):
+        return profile_serializer(super().get_serializer(*args, **kwargs))
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        duration = time.perf_counter() - start
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={profile.db_time * 1000:.1f};'
+            f'desc="{profile.queries} queries"',
+            f'serialize;dur={profile.serialize_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+        size = 0 if response.streaming else len(response.content)
+        exceeded = (profile.budget is not None
+                    and profile.queries > profile.budget)
+        registry.record(
+            (profile.endpoint or 'unresolved', request.method),
+            requests_total=1,
+            queries_total=profile.queries,
+            db_seconds_total=profile.db_time,
+            serialize_seconds_total=profile.serialize_time,
+            duration_seconds_total=duration,
+            response_bytes_total=size,
+            query_budget_exceeded_total=int(exceeded),
+        )
+        if exceeded:
+            message = (f'{request.method} {profile.endpoint}: '
+                       f'{profile.queries} SQL-запросов при бюджете '
+                       f'{profile.budget}')
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceededError(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return
+        profile.endpoint = request.resolver_match.view_name
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower())
+        budgets = getattr(getattr(view_func, 'cls', None),
+                          'query_budgets', {})
+        profile.budget = budgets.get(action)
@@ -0,0 +1,56 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+    def stream(self, items):
+        for index, item in enumerate(items, start=1):
+            yield (f'{index}. {item["ingredients__name"]} - '
+                   f'{item["total_amount"]} '
+                   f'{item["ingredients__measurement_unit"]}\n')
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in items:
+            yield writer.writerow((
+                item['ingredients__name'],
+                item['ingredients__measurement_unit'],
+                item['total_amount'],
+            ))
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    format = 'json'
+    charset = 'utf-8'
+
+    def stream(self, items):
+        separator = '['
+        for item in items:
+            yield separator + json.dumps({
+                'name': item['ingredients__name'],
+                'measurement_unit': item['ingredients__measurement_unit'],
+                'amount': item['total_amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from api.catalogue import bump_catalogue_version, get_catalogue_version
+from api.images import rendition_url, rendition_urls
+from api.user_state import get_user_state
+from recipes.models import Recipe
+
+RECIPE_KEY = 'recipe:{}:{}:{}:{}'
+
+
+def recipe_version_name(recipe_id):
+    return f'recipe-{recipe_id}'
+
+
+def user_version_name(user_id):
+    return f'user-{user_id}'
+
+
+def bump_recipe_version(recipe_id):
+    bump_catalogue_version(recipe_version_name(recipe_id))
+
+
+def bump_user_version(user_id):
+    bump_catalogue_version(user_version_name(user_id))
+
+
+def get_author_version(data):
+    if data['author'] is None:
+        return None
+    return get_catalogue_version(user_version_name(data['author']['id']))
+
+
+def get_cached_recipe_data(recipe_id):
+    key = RECIPE_KEY.format(
+        recipe_id,
+        get_catalogue_version(recipe_version_name(recipe_id))[0],
+        get_catalogue_version('ingredients')[0],
+        get_catalogue_version('tags')[0],
+    )
+    entry = cache.get(key)
+    if (entry is not None
+            and entry['author_version'] == get_author_version(entry['data'])):
+        return key, entry
+    return key, None
+
+
+def get_recipe_data(recipe_id, build):
+    key, entry = get_cached_recipe_data(recipe_id)
+    if entry is not None:
+        return entry
+    data, image = build()
+    entry = {
+        'data': data,
+        'image': image,
+        'author_version': get_author_version(data),
+    }
+    cache.set(key, entry, settings.RECIPE_CACHE_TIMEOUT)
+    return entry
+
+
+def merge_user_state(entry, state):
+    data = dict(entry['data'])
+    if data['author'] is not None:
+        data['author'] = dict(
+            data['author'],
+            is_subscribed=data['author']['id'] in state.follows,
+        )
+    data['is_favorited'] = data['id'] in state.favorites
+    data['is_in_shopping_cart'] = data['id'] in state.cart
+    field = Recipe._meta.get_field('image')
+    image = field.attr_class(None, field, entry['image'])
+    data['image'] = rendition_url(image, 'full')
+    data['renditions'] = rendition_urls(image)
+    return data
+
+
+def recipe_representation(request, recipe_id, build):
+    return merge_user_state(
+        get_recipe_data(recipe_id, build), get_user_state(request))
@@ -0,0 +1,255 @@
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict, defaultdict
+from heapq import nlargest
+from itertools import islice
+from threading import Lock
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from api.catalogue import get_catalogue_version
+from api.changes import ChangeLog
+from recipes.models import Ingredient, IngredientAmount, Recipe
+
+SEARCH_CONFIG = 'russian'
+SEARCH_RESULTS_LIMIT = 1000
+SEARCH_CACHE_SIZE = 256
+GRAM_SIZE = 3
+SUBSTRING_RESULTS_LIMIT = 100
+SEARCH_WEIGHTS = {'name': 1.0, 'ingredients': 0.4, 'text': 0.2}
+WORD = re.compile(r'\w+')
+
+UPDATE_SEARCH_VECTOR = f"""
+    UPDATE recipes_recipe SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientamount amount
+            JOIN recipes_ingredient ingredient
+                ON ingredient.id = amount.ingredients_id
+            WHERE amount.recipe_id = recipes_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', text), 'C')
+"""
+SEARCH_QUERY = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+
+search_changes = ChangeLog('search')
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._keys = None
+        self._items = None
+        self._grams = None
+
+    @staticmethod
+    def _index_grams(keys):
+        grams = defaultdict(list)
+        for index, key in enumerate(keys):
+            for gram in {
+                key[start:start + size]
+                for size in range(1, GRAM_SIZE + 1)
+                for start in range(len(key) - size + 1)
+            }:
+                grams[gram].append(index)
+        return grams
+
+    def _load(self):
+        version = get_catalogue_version('ingredients')
+        with self._lock:
+            if self._version != version:
+                rows = sorted(
+                    (name.casefold(), id, name, measurement_unit)
+                    for id, name, measurement_unit in
+                    Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit')
+                )
+                self._items = [
+                    {'id': id, 'name': name,
+                     'measurement_unit': measurement_unit}
+                    for _, id, name, measurement_unit in rows
+                ]
+                self._keys = [row[0] for row in rows]
+                self._grams = self._index_grams(self._keys)
+                self._version = version
+        return self._keys, self._items, self._grams
+
+    def is_current(self):
+        return self._version == get_catalogue_version('ingredients')
+
+    def search(self, query):
+        keys, items, grams = self._load()
+        query = query.strip().casefold()
+        if not query:
+            return items
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + chr(0x10ffff), start)
+        candidates = min(
+            (grams.get(query[index:index + GRAM_SIZE], ())
+             for index in range(max(len(query) - GRAM_SIZE, 0) + 1)),
+            key=len,
+        )
+        contains = islice((
+            items[index] for index in candidates
+            if not start <= index < end and query in keys[index]
+        ), SUBSTRING_RESULTS_LIMIT)
+        return items[start:end] + list(contains)
+
+
+class RecipeIndex:
+    def __init__(self):
+        self._lock = Lock()
+        self._sequence = None
+        self._keys = []
+        self._postings = {}
+        self._documents = {}
+        self._results = OrderedDict()
+
+    @staticmethod
+    def _read(recipe_ids=None):
+        recipes = Recipe.objects.all()
+        amounts = IngredientAmount.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            amounts = amounts.filter(recipe_id__in=recipe_ids)
+        documents = defaultdict(dict)
+        for weight, rows in (
+            (SEARCH_WEIGHTS['name'], recipes.values_list('id', 'name')),
+            (SEARCH_WEIGHTS['text'], recipes.values_list('id', 'text')),
+            (SEARCH_WEIGHTS['ingredients'],
+             amounts.values_list('recipe_id', 'ingredients__name')),
+        ):
+            for id, text in rows.iterator():
+                scores = documents[id]
+                for word in WORD.findall(text.casefold()):
+                    scores[word] = scores.get(word, 0) + weight
+        return documents
+
+    def _rebuild(self):
+        self._documents = {}
+        self._postings = defaultdict(dict)
+        for id, scores in self._read().items():
+            self._documents[id] = scores
+            for word, score in scores.items():
+                self._postings[word][id] = score
+        self._keys = sorted(self._postings)
+
+    def _update(self, documents, recipe_ids):
+        for recipe_id in recipe_ids:
+            for word in self._documents.pop(recipe_id, ()):
+                del self._postings[word][recipe_id]
+        for recipe_id, scores in documents.items():
+            self._documents[recipe_id] = scores
+            for word, score in scores.items():
+                if word not in self._postings:
+                    insort(self._keys, word)
+                self._postings[word][recipe_id] = score
+
+    def _refresh(self):
+        sequence = search_changes.sequence()
+        if self._sequence is None or sequence < self._sequence:
+            self._rebuild()
+        elif sequence > self._sequence:
+            recipe_ids = search_changes.changed_ids(self._sequence, sequence)
+            if recipe_ids is None:
+                self._rebuild()
+            else:
+                self._update(self._read(recipe_ids), recipe_ids)
+        if sequence != self._sequence:
+            self._results.clear()
+        self._sequence = sequence
+
+    def _rank(self, words):
+        ranks = None
+        for word in words:
+            start = bisect_left(self._keys, word)
+            end = bisect_left(self._keys, word + chr(0x10ffff), start)
+            if end - start == 1:
+                scores = self._postings[self._keys[start]]
+            else:
+                scores = defaultdict(float)
+                for key in self._keys[start:end]:
+                    for id, score in self._postings[key].items():
+                        scores[id] += score
+            if ranks is None:
+                ranks = scores
+            else:
+                if len(scores) < len(ranks):
+                    ranks, scores = scores, ranks
+                ranks = {
+                    id: rank + scores[id]
+                    for id, rank in ranks.items() if id in scores
+                }
+            if not ranks:
+                return {}
+        return ranks or {}
+
+    @staticmethod
+    def _group(ranks):
+        groups = defaultdict(list)
+        for id, rank in ranks.items():
+            groups[rank].append(id)
+        results, left = [], SEARCH_RESULTS_LIMIT
+        for rank in sorted(groups, reverse=True):
+            ids = groups[rank]
+            if len(ids) > left:
+                ids = nlargest(left, ids)
+            results.append((rank, ids))
+            left -= len(ids)
+            if not left:
+                break
+        return results
+
+    def search(self, query):
+        words = tuple(WORD.findall(query.casefold()))
+        with self._lock:
+            self._refresh()
+            if words in self._results:
+                self._results.move_to_end(words)
+            else:
+                self._results[words] = self._group(self._rank(words))
+                if len(self._results) > SEARCH_CACHE_SIZE:
+                    self._results.popitem(last=False)
+            return self._results[words]
+
+
+ingredient_index = IngredientIndex()
+recipe_index = RecipeIndex()
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        return queryset.filter(
+            RawSQL(f'recipes_recipe.search_vector @@ {SEARCH_QUERY}',
+                   (query,), output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(
+            f'ts_rank(recipes_recipe.search_vector, {SEARCH_QUERY})',
+            (query,), output_field=FloatField())
+        ).order_by('-search_rank', '-pub_date', '-id')
+    groups = recipe_index.search(query)
+    return queryset.filter(
+        pk__in=[id for _, ids in groups for id in ids]
+    ).annotate(
+        search_rank=Case(
+            *(When(pk__in=ids, then=Value(rank)) for rank, ids in groups),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    ).order_by('-search_rank', '-pub_date', '-id')
+
+
+def refresh_search(recipe_ids=None):
+    if connection.vendor != 'postgresql':
+        search_changes.record(recipe_ids)
+        return
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(UPDATE_SEARCH_VECTOR)
+        else:
+            cursor.execute(
+                UPDATE_SEARCH_VECTOR + ' WHERE id = ANY(%s)',
+                [list(recipe_ids)])
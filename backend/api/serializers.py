@@ -1,12 +1,15 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import F
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-from recipes.models import (
-    Ingredient, IngredientAmount,
-    Recipe, Tag, Cart, Favorite)
+from api.converters import (Base64ImageField, RenditionImageField,
+                            RenditionsField)
+from api.images import rendition_url, rendition_urls
+from api.user_state import get_user_state
+from recipes.counters import RECIPE_COUNTERS, keep_counters
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
 from users.models import Follow
 
 User = get_user_model()
@@ -48,10 +51,7 @@ class CustomUserSerializer(UserSerializer):
         read_only_fields = 'is_subscribed',
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=user, author=obj.id).exists()
+        return obj.id in get_user_state(self.context.get('request')).follows
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -70,11 +70,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer()
     ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField(
-        method_name='get_is_favorited',
-        read_only=True
-    )
-    is_in_shopping_cart = serializers.BooleanField(default=False)
+    renditions = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -87,26 +85,34 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'renditions',
             'text',
             'cooking_time',
         )
 
     def get_ingredients(self, obj):
-        return obj.ingredients.values(
-            'id', 'name', 'measurement_unit', amount=F('recipe__amount')
-        )
+        return [
+            {
+                'id': amount.ingredients.id,
+                'name': amount.ingredients.name,
+                'measurement_unit': amount.ingredients.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in obj.ingredient.all()
+        ]
 
-    def get_is_favorited(self, recipe):
-        if self.context.get('request').user.is_anonymous:
-            return False
-        return Favorite.objects.filter(
-            user=self.context.get('request').user,
-            recipe=recipe
-        ).exists()
+    def get_renditions(self, obj):
+        return rendition_urls(obj.image)
+
+    def get_is_favorited(self, obj):
+        return obj.id in get_user_state(self.context.get('request')).favorites
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in get_user_state(self.context.get('request')).cart
 
     def to_representation(self, obj):
         data = super().to_representation(obj)
-        data["image"] = obj.image.url
+        data["image"] = rendition_url(obj.image, 'full')
         return data
 
 
@@ -133,7 +139,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
-        ingredients_set = set()
+        if not ingredients:
+            raise serializers.ValidationError(
+                'Нужен хотя бы один ингредиент.'
+            )
+        amounts = {}
         for ingredient in ingredients:
             if type(ingredient.get('amount')) == str:
                 if not ingredient.get('amount').isdigit():
@@ -145,27 +155,46 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                     ('Минимальное количество ингридиентов 1')
                 )
             id = ingredient.get('id')
-            if id in ingredients_set:
+            if not str(id).isdigit():
+                raise serializers.ValidationError(
+                    'Такого ингредиента не существует.'
+                )
+            id = int(id)
+            if id in amounts:
                 raise serializers.ValidationError(
                     'Ингредиент не должен повторяться.'
                 )
-            ingredients_set.add(id)
-        data['ingredients'] = ingredients
+            amounts[id] = int(ingredient.get('amount'))
+        if len(Ingredient.objects.in_bulk(list(amounts))) != len(amounts):
+            raise serializers.ValidationError(
+                'Такого ингредиента не существует.'
+            )
+        data['ingredients'] = amounts
         return data
 
     def add_tags_ingredients(self, instance, **validated_data):
         ingredients = validated_data['ingredients']
-        tags = validated_data['tags']
-        for tag in tags:
-            instance.tags.add(tag)
-
-        for ingredient in ingredients:
-            IngredientAmount.objects.create(
-                recipe=instance,
-                ingredients_id=ingredient.get('id'),
-                amount=ingredient.get('amount'))
+        instance.tags.set(validated_data['tags'])
+        current = {
+            amount.ingredients_id: amount
+            for amount in instance.ingredient.all()
+        }
+        instance.ingredient.filter(
+            ingredients_id__in=set(current) - set(ingredients)
+        ).delete()
+        changed = []
+        for id, amount in ingredients.items():
+            if id in current and current[id].amount != amount:
+                current[id].amount = amount
+                changed.append(current[id])
+        IngredientAmount.objects.bulk_update(changed, ['amount'])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=instance, ingredients_id=id, amount=amount)
+            for id, amount in ingredients.items() if id not in current
+        )
         return instance
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = self.initial_data.get('tags')
@@ -173,25 +202,45 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return self.add_tags_ingredients(
             recipe, ingredients=ingredients, tags=tags)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        instance.tags.clear()
         ingredients = validated_data.pop('ingredients')
         tags = self.initial_data.get('tags')
         instance = self.add_tags_ingredients(
             instance, ingredients=ingredients, tags=tags)
+        keep_counters(instance, RECIPE_COUNTERS.values())
         return super().update(instance, validated_data)
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RenditionImageField('preview')
+    renditions = RenditionsField(source='image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'renditions', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class CookableRecipeSerializer(ShortRecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + ('coverage', 'missing')
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    if not limit.isdecimal():
+        raise serializers.ValidationError({
+            'recipes_limit': 'Нужно передать неотрицательное целое число.'
+        })
+    return int(limit)
+
+
 class FollowSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='author.id')
     email = serializers.ReadOnlyField(source='author.email')
@@ -208,65 +257,51 @@ class FollowSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=obj.user, author=obj.author
-        ).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj.author, 'recipes_preview'):
+            queryset = obj.author.recipes_preview
+        else:
+            request = self.context.get('request')
+            limit = get_recipes_limit(request)
+            queryset = Recipe.objects.filter(author=obj.author)
+            if limit is not None:
+                queryset = queryset[:limit]
         return ShortRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.stats.recipes_count
 
 
 class RecipeViewSerializer(serializers.ModelSerializer):
+    image = RenditionImageField('card')
+    renditions = RenditionsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'renditions', 'cooking_time')
 
 
-class FavoriteRecipesSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=100,
+        required=False,
+    )
+    all = serializers.BooleanField(default=False)
 
     def validate(self, data):
-        if Favorite.objects.filter(
-                user=self.context.get('request').user,
-                recipe=data['recipe']
-        ).exists():
-            raise serializers.ValidationError({
-                'status': 'Уже добавлен'
-            })
+        if not data.get('ids') and not data['all']:
+            raise serializers.ValidationError(
+                'Нужно передать список рецептов.'
+            )
         return data
 
-    def to_representation(self, instance):
-        return RecipeViewSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
-
 
-class CartSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Cart
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        if Cart.objects.filter(
-                user=self.context['request'].user,
-                recipe=data['recipe']
-        ):
-            raise serializers.ValidationError('Уже добавлен')
-        return data
-
-    def to_representation(self, instance):
-        return RecipeViewSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
+class IngredientSetSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=100,
+    )
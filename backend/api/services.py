@@ -0,0 +1,13 @@
+from django.db.models import Sum
+
+from recipes.models import IngredientAmount
+
+
+def get_shopping_list(user):
+    return IngredientAmount.objects.filter(
+        recipe__cart__user=user
+    ).values(
+        'ingredients__name', 'ingredients__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredients__name', 'ingredients__measurement_unit')
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.catalogue import bump_catalogue_version
+from api.images import schedule_renditions
+from api.matching import record_changes
+from api.page_cache import bump_generation
+from api.pagination import bump_table_version
+from api.representations import bump_recipe_version, bump_user_version
+from api.search import refresh_search
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    bump_catalogue_version('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_recipes_search(instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(instance.recipe.values_list('recipe_id', flat=True))
+        transaction.on_commit(lambda: refresh_search(recipe_ids))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(**kwargs):
+    bump_catalogue_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def make_recipe_renditions(instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: schedule_renditions(name))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_recipe_search(instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: refresh_search([recipe_id]))
+
+
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def refresh_ingredient_amount_search(instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: refresh_search([recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def record_recipe_ingredients_change(instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: record_changes([recipe_id]))
+
+
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def record_ingredient_amount_change(instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: record_changes([recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_representation(instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: bump_recipe_version(recipe_id))
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def invalidate_recipe_ingredients(instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: bump_recipe_version(recipe_id))
+    transaction.on_commit(bump_generation)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        recipe_ids = [instance.pk] if action.startswith('post_') else []
+    elif action == 'pre_clear':
+        recipe_ids = list(instance.recipes.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        recipe_ids = list(pk_set)
+    else:
+        recipe_ids = []
+
+    def bump():
+        for recipe_id in recipe_ids:
+            bump_recipe_version(recipe_id)
+    if recipe_ids:
+        transaction.on_commit(bump)
+        transaction.on_commit(bump_generation)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_representation(instance, update_fields, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_user_version(user_id))
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_author_representation(instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_user_version(user_id))
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def bump_counted_table_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_table_version(sender))
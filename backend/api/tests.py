@@ -0,0 +1,980 @@
+import shutil
+import tempfile
+import tracemalloc
+from base64 import b64encode
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO, StringIO
+from math import sqrt
+from urllib.parse import urlencode
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import (AsyncClient, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, re_path
+from PIL import Image
+from recipes.counters import recount_recipes
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, RecipeSimilarity, Tag)
+from recipes.similarity import build_similarities
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from api import images
+from api.catalogue import CONTENT_KEY, get_catalogue_version
+from api.converters import Base64ImageField
+from api.matching import record_changes
+from api.profiling import QueryBudgetExceededError
+from api.search import SUBSTRING_RESULTS_LIMIT, refresh_search
+from api.serializers import RecipeWriteSerializer
+from api.services import get_shopping_list
+from api.urls import get_urlpatterns
+from api.views import IngredientsViewSet, RecipeViewSet, TagsViewSet
+
+User = get_user_model()
+
+urlpatterns = [
+    re_path(r'^api/', include((get_urlpatterns(True), 'api'))),
+]
+
+MEDIA_ROOT = tempfile.mkdtemp()
+RECIPE_IMAGE = 'recipes/recipe.jpg'
+
+
+def image_bytes(size=(200, 100), format='JPEG', orientation=None):
+    buffer = BytesIO()
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, 'red').save(buffer, format, exif=exif)
+    return buffer.getvalue()
+
+
+class APITestMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not default_storage.exists(RECIPE_IMAGE):
+            default_storage.save(RECIPE_IMAGE, ContentFile(image_bytes()))
+            images.make_renditions(RECIPE_IMAGE)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user('user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+        self.tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag-{number}')
+            for number in range(3)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        ]
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password-12345',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+
+    def create_recipe(self, author, number=0):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт {number}',
+            text='Описание',
+            image=RECIPE_IMAGE,
+            cooking_time=10,
+        )
+        recipe.tags.set(self.tags[:2])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=5)
+            for ingredient in self.ingredients[:3]
+        )
+        return recipe
+
+    def create_recipes(self, author, count):
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                image=RECIPE_IMAGE,
+                cooking_time=10,
+            )
+            for number in range(count)
+        )
+        return list(Recipe.objects.filter(author=author).order_by('id'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class APITestCase(APITestMixin, TestCase):
+    pass
+
+
+class RecipeRepresentationTest(APITestCase):
+    def test_recipe_without_author(self):
+        author = self.create_user('author')
+        recipe = self.create_recipe(author)
+        with self.captureOnCommitCallbacks(execute=True):
+            author.delete()
+        for client in (self.anonymous, self.client, self.anonymous):
+            response = client.get(f'/api/recipes/{recipe.id}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.json()['author'])
+        response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['results'][0]['author'])
+
+    def test_author_deletion_invalidates_cached_recipe(self):
+        author = self.create_user('author')
+        recipe = self.create_recipe(author)
+        response = self.anonymous.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.json()['author']['id'], author.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            author.delete()
+        response = self.anonymous.get(f'/api/recipes/{recipe.id}/')
+        self.assertIsNone(response.json()['author'])
+
+    def test_edits_invalidate_cached_recipe(self):
+        author = self.create_user('author')
+        recipe = self.create_recipe(author)
+        tag, ingredient = self.tags[0], self.ingredients[0]
+
+        def rename(instance, field, value):
+            setattr(instance, field, value)
+            instance.save()
+
+        def names(items):
+            return {item['id']: item['name'] for item in items}
+
+        edits = (
+            (lambda: rename(recipe, 'name', 'Новый рецепт'),
+             lambda data: data['name'], 'Новый рецепт'),
+            (lambda: rename(tag, 'name', 'Новый тег'),
+             lambda data: names(data['tags'])[tag.id], 'Новый тег'),
+            (lambda: rename(ingredient, 'name', 'Новый ингредиент'),
+             lambda data: names(data['ingredients'])[ingredient.id],
+             'Новый ингредиент'),
+            (lambda: IngredientAmount.objects.filter(
+                recipe=recipe, ingredients=ingredient).first().delete(),
+             lambda data: len(data['ingredients']), 2),
+            (lambda: recipe.tags.set(self.tags[2:]),
+             lambda data: [tag['id'] for tag in data['tags']],
+             [self.tags[2].id]),
+            (lambda: rename(author, 'first_name', 'Новое имя'),
+             lambda data: data['author']['first_name'], 'Новое имя'),
+        )
+        path = f'/api/recipes/{recipe.id}/'
+        for edit, read, expected in edits:
+            self.anonymous.get(path)
+            self.anonymous.get('/api/recipes/')
+            with self.captureOnCommitCallbacks(execute=True):
+                edit()
+            with self.subTest(expected=expected):
+                self.assertEqual(read(self.anonymous.get(path).json()),
+                                 expected)
+                self.assertEqual(
+                    read(self.anonymous.get('/api/recipes/').json()
+                         ['results'][0]),
+                    expected)
+
+    def test_user_flags_do_not_leak(self):
+        author = self.create_user('author')
+        recipe = self.create_recipe(author)
+        path = f'/api/recipes/{recipe.id}/'
+        with self.captureOnCommitCallbacks(execute=True):
+            for action in ('favorite', 'shopping_cart'):
+                self.client.post(f'{path}{action}/')
+            self.client.post(f'/api/users/{author.id}/subscribe/')
+        other = APIClient()
+        other.force_authenticate(self.create_user('other'))
+        for client, expected in (
+            (self.client, True),
+            (other, False),
+            (self.anonymous, False),
+            (self.client, True),
+        ):
+            for data in (client.get(path).json(),
+                         client.get('/api/recipes/').json()['results'][0]):
+                with self.subTest(expected=expected):
+                    self.assertIs(data['is_favorited'], expected)
+                    self.assertIs(data['is_in_shopping_cart'], expected)
+                    self.assertIs(data['author']['is_subscribed'], expected)
+
+
+class BatchDeleteTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.create_recipes(self.user, 45)
+        for model in (Favorite, Cart):
+            model.objects.bulk_create(
+                model(user=self.user, recipe=recipe)
+                for recipe in self.recipes
+            )
+        recount_recipes()
+
+    def test_batch_delete_runs_fixed_number_of_queries(self):
+        ids = [recipe.id for recipe in self.recipes[:40]]
+        with self.assertNumQueries(5):
+            response = self.client.delete(
+                '/api/recipes/favorite/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Favorite.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(
+            Recipe.objects.filter(id__in=ids, favorites_count=0).count(), 40)
+        self.assertFalse(Recipe.objects.exclude(
+            id__in=ids).exclude(favorites_count=1).exists())
+
+    def test_clear_cart_runs_fixed_number_of_queries(self):
+        with self.assertNumQueries(5):
+            response = self.client.delete(
+                '/api/recipes/shopping_cart/', {'all': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], 45)
+        self.assertFalse(Recipe.objects.exclude(in_carts_count=0).exists())
+
+
+class RecipeCountersTest(APITestCase):
+    def test_update_keeps_concurrent_counter_changes(self):
+        recipe = self.create_recipe(self.user)
+        fan = self.create_user('fan')
+        add_tags_ingredients = RecipeWriteSerializer.add_tags_ingredients
+
+        def favorite_meanwhile(serializer, instance, **data):
+            Favorite.objects.create(user=fan, recipe=instance)
+            return add_tags_ingredients(serializer, instance, **data)
+
+        with mock.patch.object(RecipeWriteSerializer, 'add_tags_ingredients',
+                               favorite_meanwhile):
+            response = self.client.patch(f'/api/recipes/{recipe.id}/', {
+                'name': 'Новое название',
+                'tags': [self.tags[0].id],
+                'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+
+
+class CatalogueTest(APITestCase):
+    def test_etag_matches_content(self):
+        response = self.anonymous.get('/api/tags/')
+        etag = response['ETag']
+        response = self.anonymous.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Tag.objects.filter(pk=self.tags[0].pk).update(name='Новое имя')
+        version, _ = get_catalogue_version('tags')
+        cache.delete(CONTENT_KEY.format('tags', version))
+        response = self.anonymous.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Новое имя', response.content.decode())
+
+
+class IngredientSearchTest(APITestCase):
+    def search(self, name):
+        response = self.anonymous.get('/api/ingredients/', {'name': name})
+        return [item['name'] for item in response.data]
+
+    def test_prefix_matches_come_first(self):
+        for name in ('Сахар', 'Ванильный сахар', 'Сахарная пудра', 'Соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        self.assertEqual(
+            self.search('сах'),
+            ['Сахар', 'Сахарная пудра', 'Ванильный сахар'])
+        self.assertEqual(self.search('ль'), ['Ванильный сахар', 'Соль'])
+        self.assertEqual(self.search('нт 3'), ['Ингредиент 3'])
+
+    def test_substring_matches_are_capped(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Соус {number:03}', measurement_unit='г')
+            for number in range(SUBSTRING_RESULTS_LIMIT + 10)
+        )
+        self.assertEqual(len(self.search('оус')), SUBSTRING_RESULTS_LIMIT)
+
+    def test_rename_invalidates_index(self):
+        self.assertEqual(self.search('ингредиент 1'), ['Ингредиент 1'])
+        ingredient = self.ingredients[1]
+        ingredient.name = 'Перец'
+        ingredient.save()
+        self.assertEqual(self.search('ингредиент 1'), [])
+        self.assertEqual(self.search('перец'), ['Перец'])
+        self.assertEqual(self.search('ерец'), ['Перец'])
+
+
+class RecipeListQueriesTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(30):
+            self.create_recipe(self.create_user(f'author-{number}'), number)
+        Favorite.objects.create(user=self.user, recipe=Recipe.objects.first())
+        Follow.objects.create(
+            user=self.user, author=User.objects.get(username='author-0'))
+
+    def count_queries(self, client, limit):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.client.get('/api/recipes/')
+        for client in (self.client, self.anonymous):
+            with self.subTest(anonymous=client is self.anonymous):
+                counts = {
+                    limit: self.count_queries(client, limit)
+                    for limit in (6, 30)
+                }
+                self.assertEqual(counts[6], counts[30])
+                self.assertLessEqual(counts[30], 5)
+
+
+@override_settings(PAGINATION_COUNT_CACHE_TIMEOUT=60)
+class PaginationTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.create_recipes(self.user, 10)
+
+    def count(self, **params):
+        return self.client.get('/api/recipes/', params).data['count']
+
+    def test_cached_count_refreshes_after_create_and_delete(self):
+        self.assertEqual(self.count(), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(self.user, 10)
+        self.assertEqual(self.count(), 11)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertEqual(self.count(), 10)
+
+    def test_cached_filtered_count_refreshes_after_batch_writes(self):
+        ids = [recipe.id for recipe in self.recipes[:4]]
+        self.assertEqual(self.count(is_favorited=1), 0)
+        self.client.post('/api/recipes/favorite/', {'ids': ids},
+                         format='json')
+        self.assertEqual(self.count(is_favorited=1), 4)
+        self.client.delete(f'/api/recipes/{ids[0]}/favorite/')
+        self.assertEqual(self.count(is_favorited=1), 3)
+        self.client.delete('/api/recipes/favorite/', {'all': True},
+                           format='json')
+        self.assertEqual(self.count(is_favorited=1), 0)
+
+    def test_cursor_pages_are_stable_under_inserts(self):
+        expected = [
+            recipe['id'] for recipe in self.client.get(
+                '/api/recipes/', {'limit': 10}).data['results']
+        ]
+        ids, url = [], '/api/recipes/?cursor=&limit=3'
+        while url:
+            response = self.client.get(url)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+            self.create_recipe(self.user, len(ids) + 100)
+        self.assertEqual(ids, expected)
+
+
+class RecipeFilterTest(APITestCase):
+    def test_favorite_filter_reads_database(self):
+        recipes = self.create_recipes(self.user, 3)
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        response = self.client.get('/api/recipes/', {'is_favorited': 1})
+        self.assertEqual(response.data['count'], 1)
+        Favorite.objects.bulk_create([
+            Favorite(user=self.user, recipe=recipes[1])])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/', {'is_favorited': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertTrue(any(
+            'EXISTS' in query['sql'] for query in context.captured_queries))
+
+    def test_cart_filter_reads_database(self):
+        recipes = self.create_recipes(self.user, 3)
+        self.client.get('/api/recipes/', {'is_in_shopping_cart': 1})
+        Cart.objects.bulk_create([Cart(user=self.user, recipe=recipes[2])])
+        response = self.client.get(
+            '/api/recipes/', {'is_in_shopping_cart': 1})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipes[2].id])
+
+
+class SubscriptionsTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.create_recipes(self.author, 4)
+        Follow.objects.create(user=self.user, author=self.author)
+
+    def test_recipes_limit(self):
+        for limit, count in (('2', 2), ('0', 0), ('', 4)):
+            response = self.client.get(
+                '/api/users/subscriptions/', {'recipes_limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                len(response.data['results'][0]['recipes']), count)
+
+    def test_invalid_recipes_limit(self):
+        author = self.create_user('other')
+        for limit in ('abc', '-1', '1.5'):
+            response = self.client.get(
+                '/api/users/subscriptions/', {'recipes_limit': limit})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(
+                f'/api/users/{author.id}/subscribe/?recipes_limit={limit}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('recipes_limit', response.data)
+        self.assertFalse(
+            Follow.objects.filter(user=self.user, author=author).exists())
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        result = function()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class ShoppingListStreamingTest(APITestCase):
+    LINES = 10000
+
+    def setUp(self):
+        super().setUp()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number:05}', measurement_unit='г')
+            for number in range(self.LINES)
+        )
+        recipe = self.create_recipes(self.user, 1)[0]
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=1)
+            for ingredient in Ingredient.objects.filter(
+                name__startswith='Продукт')
+        )
+        Cart.objects.create(user=self.user, recipe=recipe)
+
+    def test_memory_stays_flat(self):
+        _, materialized = peak_memory(
+            lambda: list(get_shopping_list(self.user)))
+        for format in ('txt', 'csv', 'json'):
+            with self.subTest(format=format):
+                (streaming, lines), peak = peak_memory(
+                    lambda: self.download(format))
+                self.assertTrue(streaming)
+                if format != 'json':
+                    self.assertGreaterEqual(lines, self.LINES)
+                self.assertLess(peak, materialized / 2)
+
+    def download(self, format):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': format})
+        return response.streaming, sum(
+            chunk.count(b'\n') for chunk in response.streaming_content)
+
+
+class ShoppingListQueriesTest(APITestCase):
+    def fill_cart(self, user, count):
+        recipes = self.create_recipes(user, count)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=2)
+            for recipe in recipes
+            for ingredient in self.ingredients
+        )
+        Cart.objects.bulk_create(
+            Cart(user=user, recipe=recipe) for recipe in recipes)
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        for count in (1, 50):
+            user = self.create_user(f'buyer-{count}')
+            self.fill_cart(user, count)
+            self.client.force_authenticate(user)
+            with self.subTest(count=count), self.assertNumQueries(1):
+                response = self.client.get(
+                    '/api/recipes/download_shopping_cart/', {'format': 'txt'})
+                content = b''.join(response.streaming_content).decode()
+            self.assertIn(f'10. Ингредиент 9 - {count * 2} г', content)
+
+
+class QueryPlanTest(APITestCase):
+    def test_hot_queries_use_indexes(self):
+        author = self.create_user('author')
+        for number in range(5):
+            recipe = self.create_recipe(author, number)
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            Cart.objects.create(user=self.user, recipe=recipe)
+        Follow.objects.create(user=self.user, author=author)
+        output = StringIO()
+        try:
+            call_command('check_query_plans', stdout=output, stderr=output)
+        except CommandError as error:
+            self.fail(f'{error}\n{output.getvalue()}')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SimilarityTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.a, self.b, self.c, self.d = self.create_recipes(self.user, 4)
+        for username, recipes in (
+            ('first', (self.a, self.b)),
+            ('second', (self.a, self.b, self.c)),
+            ('third', (self.b, self.c)),
+        ):
+            user = self.create_user(username)
+            for recipe in recipes:
+                Favorite.objects.create(user=user, recipe=recipe)
+        build_similarities()
+
+    def test_cosine_scores(self):
+        scores = {
+            (row.recipe_id, row.similar_id): row.score
+            for row in RecipeSimilarity.objects.all()
+        }
+        expected = {
+            (self.a.id, self.b.id): 2 / sqrt(6),
+            (self.a.id, self.c.id): 1 / 2,
+            (self.b.id, self.a.id): 2 / sqrt(6),
+            (self.b.id, self.c.id): 2 / sqrt(6),
+            (self.c.id, self.a.id): 1 / 2,
+            (self.c.id, self.b.id): 2 / sqrt(6),
+        }
+        self.assertEqual(scores.keys(), expected.keys())
+        for pair, score in expected.items():
+            self.assertAlmostEqual(scores[pair], score)
+
+    def test_similar(self):
+        response = self.client.get(f'/api/recipes/{self.a.id}/similar/')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [self.b.id, self.c.id])
+        response = self.client.get('/api/recipes/0/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_recommended_ordering(self):
+        response = self.client.get('/api/recipes/recommended/')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data[:3]],
+            [self.b.id, self.c.id, self.a.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{self.c.id}/favorite/')
+        response = self.client.get('/api/recipes/recommended/')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [self.b.id, self.a.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{self.a.id}/favorite/')
+        response = self.client.get('/api/recipes/recommended/')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data], [self.b.id])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ConcurrentToggleTest(APITestMixin, TransactionTestCase):
+    REQUESTS = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Общая in-memory база SQLite не ждёт блокировок, '
+                          'задайте DB_TEST_NAME')
+        super().setUp()
+        self.author = self.create_user('author')
+        self.recipe = self.create_recipes(self.author, 1)[0]
+
+    def parallel(self, method, path):
+        def send(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                return getattr(client, method)(path).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.REQUESTS) as executor:
+            return sorted(executor.map(send, range(self.REQUESTS)))
+
+    def test_parallel_favorite(self):
+        path = f'/api/recipes/{self.recipe.id}/favorite/'
+        self.assertEqual(self.parallel('post', path),
+                         [201] + [400] * (self.REQUESTS - 1))
+        self.assertEqual(Favorite.objects.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.parallel('delete', path),
+                         [204] + [400] * (self.REQUESTS - 1))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_parallel_subscribe(self):
+        path = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(self.parallel('post', path),
+                         [201] + [400] * (self.REQUESTS - 1))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.parallel('delete', path),
+                         [204] + [400] * (self.REQUESTS - 1))
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 0)
+
+
+class ImmediateExecutor:
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class ImagePipelineTest(APITestCase):
+    def to_internal_value(self, payload):
+        return Base64ImageField().to_internal_value(
+            'data:image/png;base64,' + payload)
+
+    def test_invalid_base64(self):
+        with self.assertRaises(ValidationError):
+            self.to_internal_value('не base64!')
+
+    def test_non_image_payload(self):
+        with self.assertRaises(ValidationError):
+            self.to_internal_value(b64encode(b'just text').decode())
+
+    def test_format_is_sniffed_from_content(self):
+        image = self.to_internal_value(
+            b64encode(image_bytes(format='PNG')).decode())
+        self.assertTrue(image.name.endswith('.png'))
+
+    def test_rendition_urls(self):
+        name = default_storage.save(
+            'recipes/photo.jpg',
+            ContentFile(image_bytes(size=(2000, 1000), orientation=6)))
+        image = Recipe(image=name).image
+        with mock.patch.object(images, 'schedule_renditions') as schedule:
+            self.assertEqual(images.rendition_url(image, 'card'), image.url)
+        schedule.assert_called_once_with(name)
+        images.make_renditions(name)
+        urls = images.rendition_urls(image)
+        for size, bound in images.RENDITIONS.items():
+            path = images.rendition_name(name, size)
+            self.assertEqual(urls[size], default_storage.url(path))
+            with default_storage.open(path) as file:
+                width, height = Image.open(file).size
+            self.assertEqual(height, bound)
+            self.assertLess(width, height)
+        images.delete_image(name)
+        self.assertFalse(default_storage.exists(
+            images.rendition_name(name, 'card')))
+
+    def test_failed_renditions_are_logged_once(self):
+        name = 'recipes/missing.jpg'
+        self.addCleanup(images.failed.pop, name, None)
+        make = mock.Mock(side_effect=FileNotFoundError)
+        with mock.patch.multiple(
+            images, executor=ImmediateExecutor(), make_renditions=make,
+        ):
+            with self.assertLogs('api.images', 'ERROR'):
+                images.schedule_renditions(name)
+            images.schedule_renditions(name)
+        make.assert_called_once_with(name)
+
+
+class CookableTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        author = self.create_user('author')
+        self.recipes = self.create_recipes(author, 6)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=1)
+            for number, recipe in enumerate(self.recipes)
+            for ingredient in self.ingredients[number:number + 3]
+        )
+        record_changes()
+        self.query = [ingredient.id for ingredient in self.ingredients[2:5]]
+
+    def cookable(self):
+        response = self.anonymous.get('/api/recipes/cookable/', {
+            'ingredients': ','.join(map(str, self.query)), 'limit': 100})
+        self.assertEqual(response.status_code, 200)
+        return {
+            recipe['id']: (recipe['coverage'], recipe['missing'])
+            for recipe in response.json()['results']
+        }
+
+    def brute_force(self):
+        recipes = {}
+        for amount in IngredientAmount.objects.all():
+            recipes.setdefault(amount.recipe_id, set()).add(
+                amount.ingredients_id)
+        return {
+            id: (round(len(ingredients & set(self.query))
+                       / len(ingredients), 2),
+                 len(ingredients - set(self.query)))
+            for id, ingredients in recipes.items()
+            if ingredients & set(self.query)
+        }
+
+    def test_matches_brute_force_after_ingredient_amount_edits(self):
+        self.assertEqual(self.cookable(), self.brute_force())
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientAmount.objects.create(
+                recipe=self.recipes[5], ingredients=self.ingredients[2],
+                amount=1)
+        self.assertEqual(self.cookable(), self.brute_force())
+        amount = IngredientAmount.objects.get(
+            recipe=self.recipes[0], ingredients=self.ingredients[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            amount.ingredients = self.ingredients[4]
+            amount.save()
+        self.assertEqual(self.cookable(), self.brute_force())
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientAmount.objects.filter(
+                ingredients=self.ingredients[3]).delete()
+        self.assertEqual(self.cookable(), self.brute_force())
+
+
+class RecipeSearchTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        author = self.create_user('author')
+        self.tomato = Ingredient.objects.create(
+            name='Томатный соус', measurement_unit='г')
+        self.by_name, self.by_ingredient, self.by_text = [
+            self.create_recipe(author, number) for number in range(3)]
+        Recipe.objects.filter(pk=self.by_name.pk).update(
+            name='Томатный суп')
+        Recipe.objects.filter(pk=self.by_text.pk).update(
+            text='Подавать с томатный пастой')
+        IngredientAmount.objects.create(
+            recipe=self.by_ingredient, ingredients=self.tomato, amount=1)
+        self.create_recipe(author, 3)
+        refresh_search()
+
+    def search(self, query):
+        response = self.anonymous.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_ranked_by_field_weight(self):
+        self.assertEqual(self.search('томатный'), [
+            self.by_name.id, self.by_ingredient.id, self.by_text.id])
+        self.assertEqual(self.search('томатный соус'),
+                         [self.by_ingredient.id])
+        self.assertEqual(self.search('картофель'), [])
+
+    @skipIf(connection.vendor == 'postgresql', 'префиксы только в индексе')
+    def test_fallback_index_matches_prefixes(self):
+        self.assertEqual(self.search('томат'), [
+            self.by_name.id, self.by_ingredient.id, self.by_text.id])
+        self.assertEqual(self.search('ТОМ СО'), [self.by_ingredient.id])
+
+    def test_ingredient_amount_writes_refresh_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientAmount.objects.create(
+                recipe=self.by_text, ingredients=self.tomato, amount=1)
+        self.assertEqual(self.search('соус'),
+                         [self.by_text.id, self.by_ingredient.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientAmount.objects.filter(
+                recipe=self.by_ingredient, ingredients=self.tomato).delete()
+        self.assertEqual(self.search('соус'), [self.by_text.id])
+
+    def test_recipe_update_refreshes_search(self):
+        client = APIClient()
+        client.force_authenticate(self.by_name.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(
+                f'/api/recipes/{self.by_name.id}/', {
+                    'tags': [tag.id for tag in self.tags[:1]],
+                    'ingredients': [{'id': self.tomato.id, 'amount': 2}],
+                }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('соус'),
+                         [self.by_ingredient.id, self.by_name.id])
+
+
+@override_settings(PROFILING_ENABLED=True, QUERY_BUDGET_STRICT=True)
+class ProfilingTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.token_client = APIClient()
+        self.token_client.credentials(HTTP_AUTHORIZATION='Token {}'.format(
+            Token.objects.create(user=self.user).key))
+        self.author = self.create_user('author')
+        self.recipes = [
+            self.create_recipe(self.author, number) for number in range(3)]
+        Cart.objects.create(user=self.user, recipe=self.recipes[0])
+        Follow.objects.create(user=self.user, author=self.author)
+
+    def test_budgeted_actions_stay_within_budget(self):
+        recipe, author = self.recipes[1].id, self.author.id
+        other = self.create_user('other').id
+        ingredient = self.ingredients[0].id
+        requests = (
+            ('get', '/api/tags/'),
+            ('get', f'/api/tags/{self.tags[0].id}/'),
+            ('get', '/api/ingredients/'),
+            ('get', '/api/ingredients/?name=инг'),
+            ('get', f'/api/ingredients/{ingredient}/'),
+            ('get', '/api/users/'),
+            ('get', f'/api/users/{author}/'),
+            ('get', '/api/users/me/'),
+            ('post', f'/api/users/{other}/subscribe/'),
+            ('delete', f'/api/users/{other}/subscribe/'),
+            ('get', '/api/users/subscriptions/'),
+            ('get', '/api/recipes/'),
+            ('get', f'/api/recipes/{recipe}/'),
+            ('post', f'/api/recipes/{recipe}/favorite/'),
+            ('delete', f'/api/recipes/{recipe}/favorite/'),
+            ('post', f'/api/recipes/{recipe}/shopping_cart/'),
+            ('delete', f'/api/recipes/{recipe}/shopping_cart/'),
+            ('get', f'/api/recipes/{recipe}/similar/'),
+            ('get', '/api/recipes/recommended/'),
+            ('get', f'/api/recipes/cookable/?ingredients={ingredient}'),
+            ('get', '/api/recipes/download_shopping_cart/'),
+        )
+        for client in (self.token_client, self.anonymous):
+            for method, path in requests:
+                with self.subTest(method=method, path=path,
+                                  anonymous=client is self.anonymous):
+                    response = getattr(client, method)(path)
+                    self.assertLess(response.status_code, 500)
+                    if client is self.token_client:
+                        self.assertLess(response.status_code, 400)
+
+    def test_exceeded_budget_fails(self):
+        with mock.patch.dict(TagsViewSet.query_budgets, {'list': 0}):
+            with self.assertRaises(QueryBudgetExceededError):
+                self.anonymous.get('/api/tags/')
+
+    def test_server_timing_header(self):
+        response = self.token_client.get('/api/recipes/')
+        self.assertRegex(response['Server-Timing'], (
+            r'^db;dur=\d+\.\d;desc="[1-9]\d* queries", '
+            r'serialize;dur=\d+\.\d, total;dur=\d+\.\d$'))
+        serialize, total = [
+            float(part.split('dur=')[1])
+            for part in response['Server-Timing'].split(', ')[1:]]
+        self.assertLessEqual(serialize, total)
+
+    def test_serializer_time_is_recorded(self):
+        self.token_client.get('/api/recipes/')
+        metrics = self.anonymous.get('/api/_metrics').content.decode()
+        line = next(
+            line for line in metrics.splitlines()
+            if line.startswith('foodgram_serialize_seconds_total')
+            and 'recipe-list' in line and 'GET' in line)
+        self.assertGreater(float(line.split()[-1]), 0)
+
+    def test_metrics_access(self):
+        self.assertEqual(
+            self.anonymous.get('/api/_metrics').status_code, 200)
+        self.assertEqual(self.anonymous.get(
+            '/api/_metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+        self.assertEqual(self.token_client.get(
+            '/api/_metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+        staff = self.create_user('staff')
+        staff.is_staff = True
+        staff.save()
+        client = APIClient()
+        client.force_login(staff)
+        response = client.get('/api/_metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE foodgram_requests_total counter',
+                      response.content.decode())
+        with override_settings(PROFILING_ENABLED=False):
+            self.assertEqual(client.get('/api/_metrics').status_code, 404)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(self.create_user('author'))
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.token = Token.objects.create(user=self.user).key
+        self.async_client = AsyncClient()
+
+    async def test_anonymous_detail_is_served_from_cache(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        response = await self.async_client.get(path)
+        self.assertEqual(response.status_code, 200)
+        with mock.patch.object(
+                RecipeViewSet, 'retrieve', side_effect=AssertionError):
+            cached = await self.async_client.get(path)
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.json(), response.json())
+        self.assertFalse(cached.json()['is_favorited'])
+        self.assertIn('Accept', cached['Vary'])
+
+    async def test_authenticated_detail_uses_viewset(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        await self.async_client.get(path)
+        response = await self.async_client.get(
+            path, AUTHORIZATION=f'Token {self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+
+    async def test_anonymous_list_is_served_from_page_cache(self):
+        response = await self.async_client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        with mock.patch.object(
+                RecipeViewSet, 'list', side_effect=AssertionError):
+            cached = await self.async_client.get('/api/recipes/')
+        self.assertEqual(cached.content, response.content)
+
+    async def test_catalogue_and_ingredient_search(self):
+        response = await self.async_client.get('/api/tags/')
+        self.assertEqual(len(response.json()), len(self.tags))
+        cached = await self.async_client.get(
+            '/api/tags/', IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        path = '/api/ingredients/?' + urlencode({'name': 'нт 3'})
+        response = await self.async_client.get(path)
+        with mock.patch.object(
+                IngredientsViewSet, 'list', side_effect=AssertionError):
+            cached = await self.async_client.get(path)
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(
+            [item['name'] for item in cached.json()], ['Ингредиент 3'])
+
+    async def test_writes_go_to_viewset(self):
+        response = await self.async_client.post(
+            '/api/recipes/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(ASGI_SERVER=True)
+    async def test_shopping_list_streams_under_asgi(self):
+        await sync_to_async(Cart.objects.create)(
+            user=self.user, recipe=self.recipe)
+        response = await self.async_client.get(
+            '/api/recipes/download_shopping_cart/',
+            AUTHORIZATION=f'Token {self.token}')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn(self.ingredients[0].name, content)
@@ -1,8 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from api.views import (FollowViewSet, IngredientsViewSet, RecipeViewSet,
-                       TagsViewSet)
+                       TagsViewSet, metrics)
 
 app_name = 'api'
 
@@ -12,8 +13,28 @@ router.register('ingredients', IngredientsViewSet)
 router.register('recipes', RecipeViewSet)
 router.register('users', FollowViewSet)
 
-urlpatterns = [
-    path('', include(router.urls)),
-    path('', include('djoser.urls')),
-    path('auth/', include('djoser.urls.authtoken')),
-]
+
+def get_async_urlpatterns():
+    from api import async_views
+
+    return [
+        path('tags/', async_views.tag_list, name='tag-list'),
+        path('ingredients/', async_views.ingredient_list,
+             name='ingredient-list'),
+        path('recipes/', async_views.recipe_list, name='recipe-list'),
+        path('recipes/<int:pk>/', async_views.recipe_detail,
+             name='recipe-detail'),
+    ]
+
+
+def get_urlpatterns(async_read_views):
+    return [
+        path('_metrics', metrics, name='metrics'),
+        *(get_async_urlpatterns() if async_read_views else ()),
+        path('', include(router.urls)),
+        path('', include('djoser.urls')),
+        path('auth/', include('djoser.urls.authtoken')),
+    ]
+
+
+urlpatterns = get_urlpatterns(settings.ASYNC_READ_VIEWS)
@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Cart, Favorite
+from users.models import Follow
+
+UserState = namedtuple('UserState', ('favorites', 'cart', 'follows'))
+
+EMPTY_STATE = UserState(frozenset(), frozenset(), frozenset())
+STATE_KEY = 'user-state:{}'
+
+
+def load_user_state(user):
+    return UserState(
+        frozenset(Favorite.objects.filter(
+            user=user).values_list('recipe_id', flat=True)),
+        frozenset(Cart.objects.filter(
+            user=user).values_list('recipe_id', flat=True)),
+        frozenset(Follow.objects.filter(
+            user=user).values_list('author_id', flat=True)),
+    )
+
+
+def get_user_state(request):
+    if request is None or request.user.is_anonymous:
+        return EMPTY_STATE
+    state = getattr(request, '_user_state', None)
+    if state is None:
+        key = STATE_KEY.format(request.user.pk)
+        state = cache.get(key)
+        if state is None:
+            state = load_user_state(request.user)
+            cache.set(key, state, settings.USER_STATE_CACHE_TIMEOUT)
+        request._user_state = state
+    return state
+
+
+def invalidate_user_state(request):
+    cache.delete(STATE_KEY.format(request.user.pk))
+    request._user_state = None
@@ -1,45 +1,98 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Prefetch, Subquery, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import Cart, Favorite, Ingredient, Recipe, Tag
+from recipes.counters import RECIPE_COUNTERS, delete_counted, recount_recipes
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, Tag)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, TagFavoritShopingFilter
-from api.pagination import LimitPageNumberPagination
+from api.catalogue import catalogue_response
+from api.filters import (IngredientFilter, RecipeSearchFilter,
+                         TagFavoritShopingFilter)
+from api.matching import ingredient_matcher
+from api.page_cache import cached_page_response
+from api.pagination import (FollowPagination, LimitPageNumberPagination,
+                            RecipePagination, bump_table_version)
 from api.permissions import AdminOrReadOnly, AdminUserOrReadOnly
-from api.serializers import (FollowSerializer, IngredientSerializer,
-                             RecipeReadSerializer, RecipeWriteSerializer,
-                             ShortRecipeSerializer, TagSerializer,
-                             FavoriteRecipesSerializer, CartSerializer)
-from users.models import Follow
+from api.profiling import (ProfiledSerializerMixin, profile_serializer,
+                           registry)
+from api.representations import recipe_representation
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTextRenderer)
+from api.serializers import (CookableRecipeSerializer, FollowSerializer,
+                             IngredientSerializer, IngredientSetSerializer,
+                             RecipeIdsSerializer, RecipeReadSerializer,
+                             RecipeViewSerializer,
+                             RecipeWriteSerializer, ShortRecipeSerializer,
+                             TagSerializer, get_recipes_limit)
+from api.search import ingredient_index
+from api.services import get_shopping_list
+from api.user_state import get_user_state, invalidate_user_state
+from users.models import Follow, UserStats
 
 User = get_user_model()
 
+RECOMMENDED_LIMIT = 6
+RECOMMENDED_MAX_LIMIT = 100
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagsViewSet(ProfiledSerializerMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = (AdminOrReadOnly,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    query_budgets = {'list': 2, 'retrieve': 2}
+
+    def list(self, request, *args, **kwargs):
+        return catalogue_response(
+            request, 'tags',
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(ProfiledSerializerMixin,
+                         viewsets.ReadOnlyModelViewSet):
     permission_classes = (AdminOrReadOnly,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
+    query_budgets = {'list': 2, 'retrieve': 2}
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientFilter.search_param)
+        if name:
+            return Response(ingredient_index.search(name))
+        return catalogue_response(
+            request, 'ingredients',
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
 
 
-class FollowViewSet(UserViewSet):
-    pagination_class = LimitPageNumberPagination
+class FollowViewSet(ProfiledSerializerMixin, UserViewSet):
+    pagination_class = FollowPagination
+    query_budgets = {
+        'list': 6,
+        'retrieve': 5,
+        'me': 4,
+        'subscribe': 8,
+        'del_subscribe': 7,
+        'subscriptions': 6,
+    }
 
     @action(
         methods=['post'], detail=True, permission_classes=[IsAuthenticated])
     def subscribe(self, request, id=None):
+        get_recipes_limit(request)
         user = request.user
         author = get_object_or_404(User, id=id)
 
@@ -47,51 +100,95 @@ class FollowViewSet(UserViewSet):
             return Response({
                 'errors': 'Ошибка подписки, нельзя подписываться на себя'
             }, status=status.HTTP_400_BAD_REQUEST)
-        if Follow.objects.filter(user=user, author=author).exists():
+        try:
+            with transaction.atomic():
+                follow = Follow.objects.create(user=user, author=author)
+        except IntegrityError:
             return Response({
                 'errors': 'Ошибка подписки, вы уже подписаны на пользователя'
             }, status=status.HTTP_400_BAD_REQUEST)
-
-        follow = Follow.objects.create(user=user, author=author)
-        serializer = FollowSerializer(
+        invalidate_user_state(request)
+        serializer = profile_serializer(FollowSerializer(
             follow, context={'request': request}
-        )
+        ))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def del_subscribe(self, request, id=None):
         user = request.user
-        author = get_object_or_404(User, id=id)
-        if user == author:
+        if str(user.id) == str(id):
             return Response({
                 'errors': 'Ошибка отписки, нельзя отписываться от самого себя'
             }, status=status.HTTP_400_BAD_REQUEST)
-        follow = Follow.objects.filter(user=user, author=author)
-        if not follow.exists():
+        deleted, _ = delete_counted(
+            Follow.objects.filter(user=user, author_id=id),
+            'author', UserStats, 'followers_count', 'user_id')
+        if not deleted:
+            get_object_or_404(User, id=id)
             return Response({
                 'errors': 'Ошибка отписки, вы уже отписались'
             }, status=status.HTTP_400_BAD_REQUEST)
-        follow.delete()
+        bump_table_version(Follow)
+        invalidate_user_state(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        recipes = Recipe.objects.all()
+        limit = get_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:limit]
+            ))
+        queryset = Follow.objects.filter(user=user).select_related(
+            'author__stats'
+        ).prefetch_related(
+            Prefetch(
+                'author__recipes', queryset=recipes, to_attr='recipes_preview')
+        )
         pages = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(
+        serializer = profile_serializer(FollowSerializer(
             pages,
             many=True,
             context={'request': request}
-        )
+        ))
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfiledSerializerMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipePagination
+    filter_backends = (DjangoFilterBackend, RecipeSearchFilter, OrderingFilter)
     filter_class = TagFavoritShopingFilter
+    ordering_fields = ('pub_date', 'favorites_count', 'id')
     permission_classes = [AdminUserOrReadOnly]
+    query_budgets = {
+        'list': 10,
+        'retrieve': 7,
+        'favorite': 6,
+        'delete_favorite': 6,
+        'shopping_cart': 6,
+        'delete_shopping_cart': 6,
+        'similar': 3,
+        'recommended': 5,
+        'cookable': 3,
+        'download_shopping_cart': 2,
+    }
+
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredients').order_by('ingredients__name')
+            ),
+        )
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -101,27 +198,195 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        get_page = super().list
+        if (request.user.is_anonymous
+                and request.accepted_renderer.format == 'json'):
+            return cached_page_response(
+                request, lambda: get_page(request, *args, **kwargs).data)
+        return get_page(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(recipe_representation(
+            request, self.kwargs['pk'], self.build_representation))
+
+    def build_representation(self):
+        instance = self.get_object()
+        data = self.get_serializer(instance, context={'request': None}).data
+        return data, instance.image.name
+
     @staticmethod
-    def post_method_for_actions(request, pk, serializers):
-        data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializers(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+    def post_method_for_actions(request, pk, model):
+        recipe = get_object_or_404(Recipe, id=pk)
+        try:
+            with transaction.atomic():
+                model.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
+            return Response({
+                'errors': 'Рецепт уже добавлен'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        invalidate_user_state(request)
+        serializer = profile_serializer(
+            RecipeViewSerializer(recipe, context={'request': request}))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
     def delete_method_for_actions(request, pk, model):
+        deleted, _ = delete_counted(
+            model.objects.filter(user=request.user, recipe_id=pk),
+            'recipe', Recipe, RECIPE_COUNTERS[model])
+        if not deleted:
+            return Response({
+                'errors': 'Рецепта нет в списке'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        bump_table_version(model)
+        invalidate_user_state(request)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def batch_post_for_actions(request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids', [])
         user = request.user
+        with transaction.atomic():
+            existing = set(Recipe.objects.filter(
+                id__in=ids).values_list('id', flat=True))
+            added = set(model.objects.filter(
+                user=user, recipe_id__in=ids
+            ).values_list('recipe_id', flat=True))
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=id) for id in existing - added],
+                ignore_conflicts=True,
+            )
+            recount_recipes(Recipe.objects.filter(id__in=existing - added))
+        bump_table_version(model)
+        invalidate_user_state(request)
+        results = []
+        for id in ids:
+            if id not in existing:
+                results.append({'id': id, 'status': 'not_found'})
+            elif id in added:
+                results.append({'id': id, 'status': 'exists'})
+            else:
+                results.append({'id': id, 'status': 'added'})
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def batch_delete_for_actions(request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = model.objects.filter(user=request.user)
+        delete_all = serializer.validated_data['all']
+        if not delete_all:
+            ids = serializer.validated_data['ids']
+            queryset = queryset.filter(recipe_id__in=ids)
+        deleted, removed = delete_counted(
+            queryset, 'recipe', Recipe, RECIPE_COUNTERS[model])
+        bump_table_version(model)
+        invalidate_user_state(request)
+        if delete_all:
+            return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+        return Response({'results': [
+            {'id': id, 'status': 'deleted' if id in removed else 'missing'}
+            for id in ids
+        ]}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return self.batch_post_for_actions(request=request, model=Favorite)
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        return self.batch_delete_for_actions(request=request, model=Favorite)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return self.batch_post_for_actions(request=request, model=Cart)
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        return self.batch_delete_for_actions(request=request, model=Cart)
+
+    @staticmethod
+    def get_limit(request):
+        try:
+            limit = int(request.query_params.get('limit', RECOMMENDED_LIMIT))
+        except ValueError:
+            limit = RECOMMENDED_LIMIT
+        return min(max(limit, 1), RECOMMENDED_MAX_LIMIT)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        model_obj = get_object_or_404(model, user=user, recipe=recipe)
-        model_obj.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        recipes = Recipe.objects.filter(
+            similar_to__recipe=recipe
+        ).order_by('-similar_to__score', '-id')[:self.get_limit(request)]
+        serializer = profile_serializer(ShortRecipeSerializer(
+            recipes, many=True, context={'request': request}))
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def recommended(self, request):
+        favorites = get_user_state(request).favorites
+        recipes = Recipe.objects.exclude(pk__in=favorites)
+        if favorites:
+            recipes = recipes.filter(
+                similar_to__recipe_id__in=favorites
+            ).annotate(
+                score=Sum('similar_to__score')
+            ).order_by('-score', '-id')
+        else:
+            recipes = recipes.order_by('-favorites_count', '-id')
+        serializer = profile_serializer(ShortRecipeSerializer(
+            recipes[:self.get_limit(request)],
+            many=True,
+            context={'request': request},
+        ))
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def cookable(self, request):
+        serializer = IngredientSetSerializer(data={'ingredients': [
+            id for value in request.query_params.getlist('ingredients')
+            for id in value.split(',') if id
+        ]})
+        serializer.is_valid(raise_exception=True)
+        matches = ingredient_matcher.match(
+            serializer.validated_data['ingredients'])
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = Recipe.objects.in_bulk([id for id, _, _ in page])
+        results = []
+        for id, matched, total in page:
+            if id in recipes:
+                recipe = recipes[id]
+                recipe.coverage = round(matched / total, 2)
+                recipe.missing = total - matched
+                results.append(recipe)
+        serializer = profile_serializer(CookableRecipeSerializer(
+            results, many=True, context={'request': request}))
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=["POST"],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk):
         return self.post_method_for_actions(
-            request=request, pk=pk, serializers=FavoriteRecipesSerializer)
+            request=request, pk=pk, model=Favorite)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
@@ -135,7 +400,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk):
         return self.post_method_for_actions(
-            request=request, pk=pk, serializers=CartSerializer)
+            request=request, pk=pk, model=Cart)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
@@ -162,31 +427,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     @action(
-        detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ]
+    )
     def download_shopping_cart(self, request):
-        user = get_object_or_404(User, username=request.user.username)
-        shopping_cart = user.cart.all()
-        shopping_dict = {}
-        for num in shopping_cart:
-            ingredients_queryset = num.recipe.ingredient.all()
-            for ingredient in ingredients_queryset:
-                name = ingredient.ingredients.name
-                amount = ingredient.amount
-                measurement_unit = ingredient.ingredients.measurement_unit
-                if name not in shopping_dict:
-                    shopping_dict[name] = {
-                        'measurement_unit': measurement_unit,
-                        'amount': amount}
-                else:
-                    shopping_dict[name]['amount'] = (
-                        shopping_dict[name]['amount'] + amount)
-
-        shopping_list = []
-        for index, key in enumerate(shopping_dict, start=1):
-            shopping_list.append(
-                f'{index}. {key} - {shopping_dict[key]["amount"]} '
-                f'{shopping_dict[key]["measurement_unit"]}\n')
-        filename = 'shopping_cart.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        renderer = request.accepted_renderer
+        shopping_list = get_shopping_list(request.user).iterator()
+        if settings.ASGI_SERVER:
+            shopping_list = list(shopping_list)
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_list),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        filename = f'shopping_cart.{renderer.format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
+
+
+def metrics(request):
+    if not settings.PROFILING_ENABLED:
+        raise Http404
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4')
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -78,7 +79,8 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'TEST': {'NAME': os.getenv('DB_TEST_NAME')},
     }
 }
 
@@ -125,6 +127,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
 
@@ -144,6 +149,34 @@ REST_FRAMEWORK = {
     ],
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+USER_STATE_CACHE_TIMEOUT = 300
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+RECIPE_PAGE_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_PAGE_CACHE_TIMEOUT', default=60))
+RECIPE_PAGE_STALE_TIMEOUT = int(
+    os.getenv('RECIPE_PAGE_STALE_TIMEOUT', default=300))
+
+ASGI_SERVER = os.getenv('ASGI_SERVER', default='') == 'True'
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='') == 'True'
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=0))
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='') == 'True'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', default='') == 'True'
+INTERNAL_IPS = os.getenv('INTERNAL_IPS', default='127.0.0.1').split(',')
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
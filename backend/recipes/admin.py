@@ -1,5 +1,6 @@
 from django.contrib.admin import ModelAdmin, register
 
+from .counters import RECIPE_COUNTERS, keep_counters
 from .models import Cart, Favorite, Ingredient, IngredientAmount, Recipe, Tag
 
 
@@ -18,12 +19,12 @@ class IngredientAdmin(ModelAdmin):
 class RecipeAdmin(ModelAdmin):
     list_display = ('name', 'author')
     list_filter = ('author', 'name', 'tags')
-    readonly_fields = ('count_favorites',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
-    def count_favorites(self, obj):
-        return obj.favorites.count()
-
-    count_favorites.short_description = 'Число добавлений в избранное'
+    def save_model(self, request, obj, form, change):
+        if change:
+            keep_counters(obj, RECIPE_COUNTERS.values())
+        super().save_model(request, obj, form, change)
 
 
 @register(IngredientAmount)
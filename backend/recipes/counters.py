@@ -0,0 +1,79 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Cart, Favorite, Recipe
+from users.models import Follow, UserStats
+
+RECIPE_COUNTERS = {Favorite: 'favorites_count', Cart: 'in_carts_count'}
+
+
+def count_of(model, field, outer='pk'):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def change_counter(queryset, counter, delta):
+    queryset.update(**{counter: F(counter) + delta})
+
+
+def keep_counters(instance, counters):
+    # Saved as F() so a full save() cannot overwrite concurrent changes.
+    for counter in counters:
+        setattr(instance, counter, F(counter))
+
+
+def delete_counted(queryset, field, counters, counter, outer='pk'):
+    """Delete the rows of ``queryset`` and decrement ``counter`` on the
+    ``counters`` rows they point to through ``field``.
+
+    The rows are removed with a single DELETE through the private
+    ``QuerySet._raw_delete``, which skips post_delete signals and cascades:
+    the signal receivers would decrement once per row read beforehand, even
+    if a concurrent request has deleted it in the meantime. The counters
+    are decremented with F() when the DELETE removed every row read and are
+    recounted otherwise. Only use it for models that nothing references.
+
+    Return the number of deleted rows and the ``field`` values read.
+    """
+    keys = Counter(queryset.values_list(field, flat=True))
+    if not keys:
+        return 0, set()
+    targets = counters.objects.filter(**{f'{outer}__in': keys})
+    with transaction.atomic():
+        deleted = queryset.filter(
+            **{f'{field}__in': keys}
+        )._raw_delete(queryset.db)
+        if deleted != sum(keys.values()):
+            targets.update(**{counter: count_of(queryset.model, field, outer)})
+        else:
+            for delta in set(keys.values()):
+                change_counter(targets.filter(**{f'{outer}__in': [
+                    key for key, count in keys.items() if count == delta
+                ]}), counter, -delta)
+    return deleted, set(keys)
+
+
+def recount_recipes(queryset=None):
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    queryset.update(
+        favorites_count=count_of(Favorite, 'recipe'),
+        in_carts_count=count_of(Cart, 'recipe'),
+    )
+
+
+def recount_users(queryset=None):
+    if queryset is None:
+        queryset = UserStats.objects.all()
+    queryset.update(
+        recipes_count=count_of(Recipe, 'author', 'user_id'),
+        followers_count=count_of(Follow, 'author', 'user_id'),
+    )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import build_similarities
+
+
+class Command(BaseCommand):
+    help = 'building similar recipes from favorites co-occurrence'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', default=20, type=int)
+        parser.add_argument('--max-user-favorites', default=500, type=int)
+        parser.add_argument('--batch-size', default=5000, type=int)
+
+    def handle(self, *args, **options):
+        total = build_similarities(
+            top_k=options['top_k'],
+            max_per_user=options['max_user_favorites'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(f'Сохранено похожих рецептов: {total}')
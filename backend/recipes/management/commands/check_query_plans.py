@@ -0,0 +1,62 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Cart, Ingredient, IngredientAmount, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+SEQ_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'SCAN (?:TABLE )?(\w+)\s*$', re.MULTILINE),
+}
+
+
+def hot_queries():
+    user = User(pk=0)
+    return {
+        'recipe list': Recipe.objects.order_by('-pub_date', '-id')[:6],
+        'recipes by author': Recipe.objects.filter(
+            author=user).order_by('-pub_date')[:6],
+        'recipes by tag': Recipe.objects.filter(tags__slug='breakfast')[:6],
+        'favorites of user': Recipe.objects.filter(favorites__user=user),
+        'cart of user': Cart.objects.filter(user=user),
+        'shopping list': IngredientAmount.objects.filter(
+            recipe__cart__user=user),
+        'follow lookup': Follow.objects.filter(user=user, author=user),
+        'ingredient prefix': Ingredient.objects.filter(
+            name__istartswith='абр'),
+    }
+
+
+POSTGRESQL_ONLY = ('ingredient prefix',)
+
+
+class Command(BaseCommand):
+    help = 'checking that hot queries do not fall back to sequential scans'
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN:
+            raise CommandError(f'Проверка планов не поддерживает {vendor}')
+        failed = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset in hot_queries().items():
+                if vendor != 'postgresql' and name in POSTGRESQL_ONLY:
+                    continue
+                plan = queryset.explain()
+                tables = SEQ_SCAN[vendor].findall(plan)
+                if tables:
+                    failed.append(name)
+                    self.stderr.write(f'{name}: {", ".join(tables)}\n{plan}')
+                else:
+                    self.stdout.write(f'{name}: OK')
+        if failed:
+            raise CommandError(
+                f'Последовательное сканирование: {", ".join(failed)}')
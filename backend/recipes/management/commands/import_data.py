@@ -1,36 +1,121 @@
+import csv
 import json
 import os
+import re
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db.utils import IntegrityError
+from django.db import transaction
 
-from recipes.models import Ingredient
+from api.catalogue import bump_catalogue_version
+from recipes.models import Ingredient, Tag
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+CHUNK_SIZE = 64 * 1024
+SEPARATOR = re.compile(r'[\s,]*')
+
+MODELS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+    'tags': (Tag, ('name', 'color', 'slug')),
+}
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив')
+    position = 1
+    while True:
+        position = SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Файл JSON повреждён')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row and row != list(fields):
+            yield dict(zip(fields, row))
 
 
 class Command(BaseCommand):
-    help = 'loading ingredients from data in json'
+    help = 'loading ingredients or tags from data in json or csv'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.json', nargs='?',
                             type=str)
+        parser.add_argument('--model', default='ingredients',
+                            choices=MODELS.keys())
+        parser.add_argument('--batch-size', default=1000, type=int)
 
     def handle(self, *args, **options):
+        model, fields = MODELS[options['model']]
+        path = options['filename']
+        if not os.path.exists(path):
+            path = os.path.join(DATA_ROOT, path)
         try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                data = json.load(f)
-                for ingredient in data:
-                    try:
-                        Ingredient.objects.create(name=ingredient["name"],
-                                                  measurement_unit=ingredient[
-                                                      "measurement_unit"])
-                    except IntegrityError:
-                        print(f'Ингридиет {ingredient["name"]} '
-                              f'{ingredient["measurement_unit"]} '
-                              f'уже есть в базе')
-
+            with open(path, 'r', encoding='utf-8') as f:
+                if path.endswith('.csv'):
+                    rows = read_csv(f, fields)
+                else:
+                    rows = read_json(f)
+                total, updated, count = self.load(
+                    model, fields, rows, options['batch_size'])
         except FileNotFoundError:
             raise CommandError('Файл отсутствует в директории data')
+        bump_catalogue_version(options['model'])
+        self.stdout.write(
+            f'Добавлено: {count}, обновлено: {updated}, '
+            f'пропущено: {total - count - updated}')
+
+    def load(self, model, fields, rows, batch_size):
+        before = model.objects.count()
+        seen = set()
+        total = updated = 0
+        while True:
+            batch = []
+            for row in islice(rows, batch_size):
+                total += 1
+                key = self.get_key(model, row)
+                if key not in seen:
+                    seen.add(key)
+                    batch.append(model(**{
+                        field: row[field].strip() for field in fields}))
+            if not batch:
+                break
+            with transaction.atomic():
+                if model is Tag:
+                    updated += self.update_tags(batch)
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+        return total, updated, model.objects.count() - before
+
+    @staticmethod
+    def get_key(model, row):
+        if model is Tag:
+            return row['slug'].strip()
+        return row['name'].strip(), row['measurement_unit'].strip()
+
+    @staticmethod
+    def update_tags(batch):
+        existing = Tag.objects.in_bulk(
+            [tag.slug for tag in batch], field_name='slug')
+        changed = []
+        for tag in batch:
+            current = existing.get(tag.slug)
+            if current and (current.name, current.color) != (
+                    tag.name, tag.color):
+                current.name, current.color = tag.name, tag.color
+                changed.append(current)
+        Tag.objects.bulk_update(changed, ['name', 'color'])
+        return len(changed)
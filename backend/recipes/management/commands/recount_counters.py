@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount_recipes, recount_users
+from users.models import UserStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'recounting denormalized counters of recipes and users'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recount_recipes()
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=id)
+             for id in User.objects.values_list('id', flat=True)],
+            ignore_conflicts=True,
+        )
+        recount_users()
+        self.stdout.write('Счётчики пересчитаны')
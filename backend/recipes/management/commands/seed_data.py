@@ -0,0 +1,161 @@
+import os
+import random
+from io import BytesIO
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image
+
+from api.images import delete_image
+from api.matching import record_changes
+from api.search import refresh_search
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'seed-user-'
+PASSWORD = 'seed-password'
+IMAGE_NAME = 'recipes/seed.jpg'
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'омлет', 'котлеты', 'плов', 'рагу',
+    'блины', 'запеканка', 'паста', 'борщ', 'оладьи', 'жаркое', 'соус',
+    'домашний', 'быстрый', 'летний', 'пряный', 'овощной', 'сырный',
+)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'seeding a deterministic synthetic dataset for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=100, type=int)
+        parser.add_argument('--recipes', default=1000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=8, type=int)
+        parser.add_argument('--favorites-per-user', default=20, type=int)
+        parser.add_argument('--carts-per-user', default=5, type=int)
+        parser.add_argument('--follows-per-user', default=10, type=int)
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--seed', default=0, type=int)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        for model, filename in (('ingredients', 'ingredients.csv'),
+                                ('tags', 'tags.csv')):
+            call_command(
+                'import_data', os.path.join(settings.BASE_DIR, filename),
+                model=model, stdout=self.stdout)
+        self.delete_seed_data()
+        self.save_image()
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            recipes = self.create_recipes(
+                users, options['recipes'], options['ingredients_per_recipe'])
+            for model, per_user in ((Favorite, 'favorites_per_user'),
+                                    (Cart, 'carts_per_user')):
+                self.bulk_create(model, (
+                    model(user_id=user, recipe_id=recipe)
+                    for user in users
+                    for recipe in self.sample(recipes, options[per_user])
+                ))
+            self.bulk_create(Follow, (
+                Follow(user_id=user, author_id=author)
+                for user in users
+                for author in self.sample(users, options['follows_per_user'])
+                if author != user
+            ))
+            call_command('recount_counters', stdout=self.stdout)
+            transaction.on_commit(refresh_search)
+            transaction.on_commit(record_changes)
+        self.stdout.write(
+            f'Пользователей: {len(users)}, рецептов: {len(recipes)}')
+
+    def sample(self, population, count):
+        return self.random.sample(population, min(count, len(population)))
+
+    def bulk_create(self, model, objects):
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    @staticmethod
+    def delete_seed_data():
+        with transaction.atomic():
+            Recipe.objects.filter(
+                Q(author__username__startswith=USERNAME_PREFIX)
+                | Q(author__isnull=True, image=IMAGE_NAME)
+            ).delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        delete_image(IMAGE_NAME)
+
+    def save_image(self):
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), 'orange').save(buffer, 'JPEG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipes(self, users, count, ingredients_per_recipe):
+        ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=self.random.choice(users),
+                name=' '.join(self.random.sample(WORDS, 3)),
+                text=' '.join(self.random.choices(WORDS, k=40)),
+                image=IMAGE_NAME,
+                cooking_time=self.random.randint(5, 180),
+            )
+            for _ in range(count)
+        ))
+        recipes = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).order_by('id').values_list('id', flat=True))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.sample(tags, self.random.randint(1, 3))
+        ))
+        self.bulk_create(IngredientAmount, (
+            IngredientAmount(
+                recipe_id=recipe,
+                ingredients_id=ingredient,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient in self.sample(
+                ingredients, ingredients_per_recipe)
+        ))
+        return recipes
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+def create_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+        'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)'
+    )
+
+
+def drop_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            create_ingredient_name_index, drop_ingredient_name_index),
+    ]
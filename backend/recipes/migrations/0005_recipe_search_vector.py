@@ -0,0 +1,46 @@
+# Generated by Django 3.2.13 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE recipes_recipe '
+        'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+    )
+    schema_editor.execute(
+        "UPDATE recipes_recipe SET search_vector = "
+        "setweight(to_tsvector('russian', name), 'A') "
+        "|| setweight(to_tsvector('russian', coalesce(("
+        "SELECT string_agg(ingredient.name, ' ') "
+        "FROM recipes_ingredientamount amount "
+        "JOIN recipes_ingredient ingredient "
+        "ON ingredient.id = amount.ingredients_id "
+        "WHERE amount.recipe_id = recipes_recipe.id), '')), 'B') "
+        "|| setweight(to_tsvector('russian', text), 'C')"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+    schema_editor.execute(
+        'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
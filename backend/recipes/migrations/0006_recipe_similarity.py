@@ -0,0 +1,36 @@
+# Generated by Django 3.2.13 on 2026-10-18 21:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='recipes.recipe', verbose_name='Рецепт')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='recipes.recipe', verbose_name='Похожий рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'ordering': ['recipe', '-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipesimilarity',
+            index=models.Index(fields=['recipe', '-score'], name='similarity_recipe_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipesimilarity',
+            constraint=models.UniqueConstraint(fields=('recipe', 'similar'), name='unique_recipe_similar'),
+        ),
+    ]
@@ -70,11 +70,25 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в избранное', default=0,
+        editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в корзину', default=0,
+        editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date', )
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_favorites_count_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.name}'
@@ -163,3 +177,32 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user}'
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        ordering = ['recipe', '-score']
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'similar'],
+                                    name='unique_recipe_similar')
+        ]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='similarity_recipe_score_idx'),
+        ]
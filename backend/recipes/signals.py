@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.models import Cart, Favorite, Recipe
+
+
+def change_recipe_counter(recipe_id, field, delta):
+    change_counter(Recipe.objects.filter(pk=recipe_id), field, delta)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        change_recipe_counter(instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(instance, **kwargs):
+    change_recipe_counter(instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Cart)
+def increment_in_carts_count(instance, created, **kwargs):
+    if created:
+        change_recipe_counter(instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=Cart)
+def decrement_in_carts_count(instance, **kwargs):
+    change_recipe_counter(instance.recipe_id, 'in_carts_count', -1)
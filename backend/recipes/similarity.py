@@ -0,0 +1,53 @@
+from collections import Counter, defaultdict
+from heapq import nlargest
+from itertools import chain, islice
+from math import sqrt
+
+from django.db import transaction
+
+from recipes.models import Favorite, RecipeSimilarity
+
+
+def load_favorites(max_per_user):
+    users = defaultdict(list)
+    rows = Favorite.objects.order_by('user_id', '-id').values_list(
+        'user_id', 'recipe_id')
+    for user_id, recipe_id in rows.iterator(chunk_size=10000):
+        favorites = users[user_id]
+        if len(favorites) < max_per_user:
+            favorites.append(recipe_id)
+    return users
+
+
+def similar_recipes(users, top_k):
+    fans = defaultdict(list)
+    for user_id, favorites in users.items():
+        for recipe_id in favorites:
+            fans[recipe_id].append(user_id)
+    norms = {recipe_id: sqrt(len(ids)) for recipe_id, ids in fans.items()}
+    for recipe_id, user_ids in fans.items():
+        counts = Counter(chain.from_iterable(users[id] for id in user_ids))
+        del counts[recipe_id]
+        norm = norms[recipe_id]
+        for similar, count in nlargest(
+                top_k, counts.items(),
+                key=lambda item: (item[1] / norms[item[0]], item[0])):
+            yield RecipeSimilarity(
+                recipe_id=recipe_id,
+                similar_id=similar,
+                score=count / (norm * norms[similar]),
+            )
+
+
+def build_similarities(top_k=20, max_per_user=500, batch_size=5000):
+    rows = similar_recipes(load_favorites(max_per_user), top_k)
+    total = 0
+    with transaction.atomic():
+        RecipeSimilarity.objects.all().delete()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            RecipeSimilarity.objects.bulk_create(batch)
+            total += len(batch)
+    return total
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_of(model, field, outer='pk'):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Cart = apps.get_model('recipes', 'Cart')
+    Follow = apps.get_model('users', 'Follow')
+    UserStats = apps.get_model('users', 'UserStats')
+    Recipe.objects.update(
+        favorites_count=count_of(Favorite, 'recipe'),
+        in_carts_count=count_of(Cart, 'recipe'),
+    )
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=id)
+         for id in User.objects.values_list('id', flat=True)],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        recipes_count=count_of(Recipe, 'author', 'user_id'),
+        followers_count=count_of(Follow, 'author', 'user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0004_counters'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='auth.user', verbose_name='Пользователь')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Число рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -28,3 +28,24 @@ class Follow(models.Model):
                 name='unique_follow',
             )
         ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов', default=0)
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user}'
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.models import Recipe
+from users.models import Follow, UserStats
+
+User = get_user_model()
+
+
+def change_user_counter(user_id, field, delta):
+    change_counter(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    change_user_counter(instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def increment_followers_count(instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_followers_count(instance, **kwargs):
+    change_user_counter(instance.author_id, 'followers_count', -1)